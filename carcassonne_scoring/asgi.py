@@ -2,6 +2,8 @@
 ASGI config for carcassonne_scoring project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+It is Django's handler, extended by scores.asgi to stream live game events
+and to serve read-only pages from a pool of reader threads.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
@@ -9,8 +11,12 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'carcassonne_scoring.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from scores.asgi import ScoresASGIHandler  # noqa: E402 (needs the app registry)
+
+application = ScoresASGIHandler()
@@ -50,6 +50,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-view query counts and timings, read by staff at scores/api/metrics.
+# First in the list so it measures the other middleware too.
+if os.environ.get('SCORES_METRICS'):
+    MIDDLEWARE.insert(0, 'scores.metrics.MetricsMiddleware')
+
 ROOT_URLCONF = 'carcassonne_scoring.urls'
 
 TEMPLATES = [
@@ -78,9 +83,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # An in-memory test database shares one cache between threads and
+        # fails lock waits immediately; a file lets concurrency tests queue.
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Local memory by default; set SCORES_CACHE_DIR to share one file-based
+# cache between processes. Both count hits and misses (see scores.cache).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'scores.cache.CountingLocMemCache',
+        'LOCATION': 'scores',
     }
 }
 
+if os.environ.get('SCORES_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'scores.cache.CountingFileBasedCache',
+        'LOCATION': os.environ['SCORES_CACHE_DIR'],
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -0,0 +1,330 @@
+"""
+JSON endpoints for scoring clients.
+
+POST endpoints are protected by Django's CSRF check like the pages are.
+A client first GETs api/csrf, which sets the csrftoken cookie and returns
+the same token, then sends the cookie back with every POST along with the
+token in an X-CSRFToken header.
+"""
+import json
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
+
+from . import cache, metrics, transfer
+from .models import Game, Player, Score, score_points
+from .views import conditional_response
+
+SEARCH_LIMIT = 10
+BATCH_LIMIT = 200
+# the request fields score_points counts a feature from
+COUNT_FIELDS = ('tiles', 'coats_of_arms', 'cities')
+
+def read_json(request):
+    """
+    Return the decoded JSON body of a request, or None if it isn't valid
+    """
+    try:
+        return json.loads(request.body.decode('utf-8'))
+    except ValueError:
+        return None
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+def player_json(player):
+    return {'id': player.pk, 'name': player.name}
+
+def game_json(game):
+    return {
+        'id': game.pk,
+        'name': game.name,
+        'ended': game.ended,
+        'players': [ player_json(p) for p in game.player_order() ],
+        'turn_number': game.turn_number(),
+    }
+
+def turn_json(turn):
+    return {'number': turn.number, 'player': turn.player_id}
+
+def score_json(score):
+    return {
+        'id': score.pk,
+        'player': int(score.player_id),
+        'event': score.event,
+        'points': score.points,
+    }
+
+def standing_json(gp):
+    standing = gp.standing()
+    standing['player'] = gp.player_id
+    standing['total'] = gp.total_points()
+    return standing
+
+def totals_json(game):
+    return [ standing_json(gp) for gp in game.seats() ]
+
+def find_game(game_id):
+    return Game.objects.filter(pk=game_id).first()
+
+# Each scorer takes the game, the scoring player's id and the request data
+TURN_SCORERS = {
+    'monastery': lambda g, p, d: g.score_completed_monastery(p),
+    'road': lambda g, p, d: g.score_completed_road(p, d.get('tiles', 0)),
+    'city': lambda g, p, d: g.score_completed_city(
+        p, d.get('tiles', 0), d.get('coats_of_arms', 0)
+    ),
+}
+FINAL_SCORERS = {
+    'monastery': lambda g, p, d: g.score_incomplete_monastery(
+        p, d.get('tiles', 0)
+    ),
+    'road': lambda g, p, d: g.score_incomplete_road(p, d.get('tiles', 0)),
+    'city': lambda g, p, d: g.score_incomplete_city(
+        p, d.get('tiles', 0), d.get('coats_of_arms', 0)
+    ),
+    'field': lambda g, p, d: g.score_field(p, d.get('cities', 0)),
+}
+
+@require_POST
+def create_game(request):
+    data = read_json(request)
+    if not isinstance(data, dict):
+        return error('Expected a JSON object')
+    name = data.get('name')
+    player_ids = data.get('players')
+    if not name or not isinstance(player_ids, list):
+        return error('A game needs a name and a list of player ids')
+    try:
+        game = Game.objects.create_with_players(name, player_ids)
+    except (TypeError, ValueError) as e:
+        return error(str(e))
+    return JsonResponse(game_json(game), status=201)
+
+@require_GET
+def scoreboard(request, game_id):
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    return conditional_response(request, game, lambda: JsonResponse({
+        'game': game_json(game), 'totals': totals_json(game)
+    }))
+
+@require_GET
+def timeline(request, game_id):
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    return conditional_response(request, game, lambda: JsonResponse({
+        'players': [
+            {
+                'player': player_json(line['player']),
+                'totals': line['totals'],
+                'final': line['final'],
+            }
+            for line in game.score_timeline()
+        ],
+    }))
+
+@require_POST
+def add_turn(request, game_id):
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    if game.is_ended():
+        return error('The game has ended')
+    turn = game.add_turn()
+    return JsonResponse({'turn': turn_json(turn)}, status=201)
+
+@require_POST
+def add_turn_score(request, game_id):
+    return add_score(request, game_id, TURN_SCORERS, final=False)
+
+@require_POST
+def add_final_score(request, game_id):
+    return add_score(request, game_id, FINAL_SCORERS, final=True)
+
+def add_score(request, game_id, scorers, final):
+    """
+    Record one score and return it with the scoring player's new totals
+    """
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    if game.is_ended() and not final:
+        return error('The game has ended')
+    data = read_json(request)
+    if not isinstance(data, dict):
+        return error('Expected a JSON object')
+    scorer = scorers.get(data.get('event'))
+    if scorer is None:
+        return error('Event must be one of: %s' % ', '.join(sorted(scorers)))
+    player_id = data.get('player')
+    if player_id not in game.seat_player_ids():
+        return error('Player %r is not in this game' % (player_id,))
+    try:
+        score = scorer(game, player_id, data)
+    except (TypeError, ValueError):
+        return error('Tiles, coats of arms and cities must be whole numbers')
+    gp = game.gameplayer_set.get(player_id=player_id)
+    return JsonResponse({
+        'score': score_json(score),
+        'standing': standing_json(gp),
+    }, status=201)
+
+@require_POST
+def add_scores(request, game_id):
+    """
+    Record a list of turn and final scores in one transaction. Every entry
+    is checked first, so a bad entry means nothing is recorded.
+    """
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    data = read_json(request)
+    entries = data.get('scores') if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return error('Expected a JSON object with a list of scores')
+    if len(entries) > BATCH_LIMIT:
+        return error('At most %d scores can be sent at once' % BATCH_LIMIT)
+    seated = game.seat_player_ids()
+    turn_scores = []
+    final_scores = []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            return error('Score %d: expected an object' % i)
+        final = entry.get('phase') == 'final'
+        if not final and entry.get('phase') != 'turn':
+            return error('Score %d: phase must be turn or final' % i)
+        if not final and game.is_ended():
+            return error('Score %d: the game has ended' % i)
+        if entry.get('player') not in seated:
+            return error('Score %d: player %r is not in this game' % (
+                i, entry.get('player')
+            ))
+        try:
+            points = score_points(
+                entry.get('event'),
+                final,
+                tiles=entry.get('tiles', 0),
+                coats_of_arms=entry.get('coats_of_arms', 0),
+                cities=entry.get('cities', 0),
+            )
+        except (TypeError, ValueError) as e:
+            return error('Score %d: %s' % (i, e))
+        score = Score(
+            event=entry['event'], player_id=entry['player'], points=points
+        )
+        (final_scores if final else turn_scores).append(score)
+    scores = game.add_scores(turn_scores, final_scores)
+    return JsonResponse({
+        'scores': [ score_json(s) for s in scores ],
+        'totals': totals_json(game),
+    }, status=201)
+
+@require_POST
+def edit_score(request, game_id, score_id):
+    """
+    Correct a recorded score's player, event or counts. Points are only
+    recounted when counts are sent; the score keeps its phase, and the
+    running totals are adjusted rather than recounted.
+    """
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    score = game.score_set.filter(pk=score_id).first()
+    if score is None:
+        return error('No such score', status=404)
+    data = read_json(request)
+    if not isinstance(data, dict):
+        return error('Expected a JSON object')
+    event = data.get('event', score.event)
+    player_id = data.get('player', int(score.player_id))
+    if player_id not in game.seat_player_ids():
+        return error('Player %r is not in this game' % (player_id,))
+    counts = { k: data[k] for k in COUNT_FIELDS if k in data }
+    if not counts and event != score.event:
+        return error('Changing the event needs its counts')
+    if counts:
+        try:
+            points = score_points(event, score.is_final, **counts)
+        except (TypeError, ValueError) as e:
+            return error(str(e))
+    else:
+        # only the player changes, so the points stand
+        points = score.points
+    score = game.edit_score(score.pk, player_id, event, points)
+    return JsonResponse({
+        'score': score_json(score),
+        'totals': totals_json(game),
+    })
+
+@require_POST
+def undo_score(request, game_id):
+    """
+    Remove the game's most recently recorded score
+    """
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    score = game.undo_last_score()
+    if score is None:
+        return error('There are no scores to undo')
+    return JsonResponse({
+        'removed': score_json(score),
+        'totals': totals_json(game),
+    })
+
+@require_POST
+def end_game(request, game_id):
+    game = find_game(game_id)
+    if game is None:
+        return error('No such game', status=404)
+    if not game.end_game():
+        return error('The game has ended')
+    return JsonResponse({'ended': True, 'totals': totals_json(game)})
+
+@require_GET
+@ensure_csrf_cookie
+def csrf(request):
+    return JsonResponse({'csrf_token': get_token(request)})
+
+@require_GET
+def search_players(request):
+    prefix = request.GET.get('q', '')
+    players = Player.objects.name_prefix(prefix)[:SEARCH_LIMIT]
+    return JsonResponse({'players': [ player_json(p) for p in players ]})
+
+@staff_member_required
+@require_GET
+def cache_stats(request):
+    return JsonResponse(cache.stats())
+
+@staff_member_required
+@require_GET
+def view_metrics(request):
+    return JsonResponse({'views': metrics.summary()})
+
+@staff_member_required
+@require_GET
+def export_games(request):
+    """
+    Stream every game as NDJSON or CSV (?format=), in the format
+    import_games reads
+    """
+    file_format = request.GET.get('format', 'ndjson')
+    if file_format not in transfer.WRITERS:
+        return error('Format must be one of: %s' % ', '.join(
+            sorted(transfer.WRITERS)
+        ))
+    response = StreamingHttpResponse(
+        transfer.WRITERS[file_format](transfer.export_games()),
+        content_type=transfer.CONTENT_TYPES[file_format]
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="games.%s"' % file_format
+    )
+    return response
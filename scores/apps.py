@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ScoresConfig(AppConfig):
     name = 'scores'
+
+    def ready(self):
+        # connect the game_changed receivers
+        from . import live
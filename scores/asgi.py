@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+
+from .live import stream_game_events
+
+# pages that only read from the database, served from a thread pool
+READ_ONLY_VIEWS = ('scores:index', 'scores:game', 'scores:api_scoreboard')
+READER_THREADS = 8
+
+readers = ThreadPoolExecutor(
+    max_workers=READER_THREADS, thread_name_prefix='scores-reader'
+)
+
+
+def route(path):
+    """
+    Return the namespaced view name and kwargs for a path, or (None, {})
+    if it doesn't resolve
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None, {}
+    return match.view_name, match.kwargs
+
+class ScoresASGIHandler(ASGIHandler):
+    """
+    Django's ASGI handler runs every request's view on one shared thread,
+    so a slow database read holds up everyone. This one streams live game
+    events itself and runs read-only pages on a pool of reader threads, so
+    concurrent readers wait on the database side by side. Anything that
+    writes still goes through the shared thread.
+    """
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            name, kwargs = route(scope['path'])
+            if name == 'scores:api_game_events':
+                return await stream_game_events(
+                    scope, receive, send, kwargs['game_id']
+                )
+        return await super().__call__(scope, receive, send)
+
+    async def get_response(self, request):
+        name, kwargs = route(request.path_info)
+        if request.method in ('GET', 'HEAD') and name in READ_ONLY_VIEWS:
+            return await sync_to_async(
+                self.get_read_only_response,
+                thread_sensitive=False,
+                executor=readers,
+            )(request)
+        return await sync_to_async(super().get_response)(request)
+
+    async def send_response(self, response, send):
+        """
+        Django 3.0 reads streaming responses on the event loop, where
+        database queries aren't allowed, so read each part on the shared
+        thread instead
+        """
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((header, value))
+        for cookie in response.cookies.values():
+            cookie = cookie.output(header='').encode('ascii').strip()
+            headers.append((b'Set-Cookie', cookie))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+        parts = iter(response)
+        read = sync_to_async(next)
+        while True:
+            part = await read(parts, None)
+            if part is None:
+                break
+            await send({
+                'type': 'http.response.body',
+                'body': part,
+                'more_body': True,
+            })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close)()
+
+    def get_read_only_response(self, request):
+        # the request_started and request_finished signals that manage
+        # connections fire on the shared thread, not this one
+        close_old_connections()
+        try:
+            return super().get_response(request)
+        finally:
+            close_old_connections()
@@ -0,0 +1,59 @@
+import threading
+from collections import Counter
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Django makes a cache object per thread, so the counts live out here
+lock = threading.Lock()
+hits = Counter()
+misses = Counter()
+MISSING = object()
+
+
+def namespace(key):
+    """
+    Group keys for reporting: a template fragment by its name, anything
+    else by its first two colon-separated parts
+    """
+    if key.startswith('template.cache.'):
+        return key.rsplit('.', 1)[0]
+    return ':'.join(key.split(':')[:2])
+
+def stats():
+    """
+    Hits and misses since the process started (or the last reset), in
+    total and by namespace
+    """
+    with lock:
+        names = sorted(set(hits) | set(misses))
+        return {
+            'hits': sum(hits.values()),
+            'misses': sum(misses.values()),
+            'namespaces': {
+                name: {'hits': hits[name], 'misses': misses[name]}
+                for name in names
+            },
+        }
+
+def reset():
+    with lock:
+        hits.clear()
+        misses.clear()
+
+class CountingMixin:
+    """
+    Count hits and misses for every get, including those made by get_many
+    and get_or_set
+    """
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        with lock:
+            (misses if value is MISSING else hits)[namespace(key)] += 1
+        return default if value is MISSING else value
+
+class CountingLocMemCache(CountingMixin, LocMemCache):
+    pass
+
+class CountingFileBasedCache(CountingMixin, FileBasedCache):
+    pass
@@ -0,0 +1,82 @@
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from .models import Counter, GamePlayer
+
+# cached rankings of past generations are never asked for again; this
+# lets them expire
+TIMEOUT = 24 * 60 * 60
+ORDERS = {
+    'wins': lambda row: (row['wins'], row['points']),
+    'points': lambda row: (row['points'], row['wins']),
+    'margin': lambda row: (row['average_margin'], row['wins']),
+}
+
+
+def rankings(since=None, until=None, order='wins'):
+    """
+    Rank players over ended games created between the since and until
+    dates (inclusive, either may be None). Rows are cached until the next
+    game ends or an ended game changes.
+    """
+    key = 'scores:leaderboard:%s:%s:%s' % (generation(), since, until)
+    rows = cache.get(key)
+    if rows is None:
+        rows = compute_rankings(since, until)
+        cache.set(key, rows, TIMEOUT)
+    return sorted(rows, key=ORDERS.get(order, ORDERS['wins']), reverse=True)
+
+def compute_rankings(since, until):
+    seats = GamePlayer.objects.filter(game__ended=True)
+    if since is not None:
+        seats = seats.filter(game__created__gte=start_of_day(since))
+    if until is not None:
+        seats = seats.filter(
+            game__created__lt=start_of_day(until + timedelta(days=1))
+        )
+    others = GamePlayer.objects.filter(
+        game_id=OuterRef('game_id')
+    ).exclude(pk=OuterRef('pk')).annotate(
+        total=F('turn_points') + F('final_points')
+    ).order_by('-total').values('total')[:1]
+    seats = seats.annotate(best_other=Subquery(others)).values(
+        'player_id', 'player__name', 'turn_points', 'final_points',
+        'best_other'
+    )
+    players = {}
+    for seat in seats:
+        row = players.setdefault(seat['player_id'], {
+            'player_id': seat['player_id'],
+            'name': seat['player__name'],
+            'games': 0,
+            'wins': 0,
+            'points': 0,
+            'margin': 0,
+        })
+        total = seat['turn_points'] + seat['final_points']
+        best_other = seat['best_other']
+        if best_other is None:
+            best_other = 0
+        row['games'] += 1
+        row['points'] += total
+        row['margin'] += total - best_other
+        if total >= best_other:
+            row['wins'] += 1
+    for row in players.values():
+        row['average_margin'] = row['margin'] / row['games']
+    return list(players.values())
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def generation():
+    """
+    A key that changes whenever the rankings can. Ending a game, changing
+    an ended one, importing ended games and renaming a player all bump
+    the leaderboard counter, which is read from the database so that
+    every process sees the same one.
+    """
+    return Counter.objects.read(Counter.LEADERBOARD)
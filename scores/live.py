@@ -0,0 +1,206 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .api import (
+    game_json, player_json, standing_json, totals_json, find_game
+)
+from .signals import game_changed
+
+# seconds between keepalive comments on an idle stream
+KEEPALIVE = 15
+# deltas a slow subscriber can fall behind by before newer ones are dropped
+QUEUE_SIZE = 100
+# how long an EventSource waits before reconnecting, in milliseconds
+RETRY = 5000
+
+SCORE_KINDS = ('turn_score', 'final_score', 'undo')
+
+
+class Hub:
+    """
+    In-process fan-out of game changes to the event loops serving live
+    streams. Each change is turned into a message once, however many
+    subscribers the game has.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def subscribe(self, game_id):
+        """
+        Return a queue that receives the game's messages. Call this from
+        the event loop that will read the queue.
+        """
+        queue = asyncio.Queue(QUEUE_SIZE)
+        loop = asyncio.get_event_loop()
+        with self.lock:
+            self.subscribers.setdefault(game_id, set()).add((loop, queue))
+        return queue
+
+    def unsubscribe(self, game_id, queue):
+        with self.lock:
+            subscribers = self.subscribers.get(game_id, set())
+            subscribers.difference_update(
+                [ s for s in subscribers if s[1] is queue ]
+            )
+            if not subscribers:
+                self.subscribers.pop(game_id, None)
+
+    def has_subscribers(self, game_id):
+        return game_id in self.subscribers
+
+    def publish(self, game_id, message):
+        """
+        Hand a message to every subscriber of a game. Safe to call from any
+        thread.
+        """
+        with self.lock:
+            subscribers = list(self.subscribers.get(game_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(offer, queue, message)
+
+def offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+hub = Hub()
+
+def delta(game, kind, score=None):
+    """
+    Describe a change for live viewers. Standings are sent whole, so a
+    viewer that misses a delta is corrected by the next one for that seat.
+    """
+    message = {
+        'kind': kind,
+        'turn_number': game.turn_number(),
+        'ended': game.is_ended(),
+    }
+    if kind in SCORE_KINDS and score is not None:
+        message['standings'] = [
+            standing_json(gp) for gp in game.seats()
+            if gp.player_id == int(score.player_id)
+        ]
+    else:
+        message['standings'] = totals_json(game)
+    if kind == 'turn':
+        message['current_player'] = player_json(game.current_player())
+    return message
+
+def scoreboard(game_id):
+    """
+    The full scoreboard a stream starts with, or None for a missing game
+    """
+    game = find_game(game_id)
+    if game is None:
+        return None
+    return {'game': game_json(game), 'totals': totals_json(game)}
+
+def load_scoreboard(game_id):
+    # runs outside Django's request cycle, so tidy connections up here
+    close_old_connections()
+    try:
+        return scoreboard(game_id)
+    finally:
+        close_old_connections()
+
+@receiver(game_changed)
+def publish_change(sender, game, kind, score=None, **kwargs):
+    if hub.has_subscribers(game.pk):
+        hub.publish(game.pk, delta(game, kind, score))
+
+def event_bytes(name, data):
+    return ('event: %s\ndata: %s\n\n' % (name, json.dumps(data))).encode()
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+@require_GET
+def game_events(request, game_id):
+    """
+    The same stream served synchronously (under WSGI, say): it holds just
+    the scoreboard and asks the client to reconnect after RETRY, so live
+    viewers fall back to polling.
+    """
+    board = scoreboard(game_id)
+    if board is None:
+        return HttpResponse(
+            json.dumps({'error': 'No such game'}),
+            status=404,
+            content_type='application/json'
+        )
+    response = HttpResponse(
+        ('retry: %d\n' % RETRY).encode() + event_bytes('scoreboard', board),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+async def stream_game_events(scope, receive, send, game_id):
+    """
+    Stream a game as server-sent events: a 'scoreboard' event with the
+    whole scoreboard, then a 'delta' event for each change.
+    """
+    # subscribe first so no change slips in after the scoreboard is read
+    queue = hub.subscribe(game_id)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        board = await sync_to_async(load_scoreboard)(game_id)
+        if board is None:
+            await send({
+                'type': 'http.response.start',
+                'status': 404,
+                'headers': [(b'content-type', b'application/json')],
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': json.dumps({'error': 'No such game'}).encode(),
+            })
+            return
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': event_bytes('scoreboard', board),
+            'more_body': True,
+        })
+        while True:
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {get, disconnect},
+                timeout=KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if get not in done:
+                get.cancel()
+            if disconnect in done:
+                return
+            if get in done:
+                body = event_bytes('delta', get.result())
+            else:
+                body = b': keepalive\n\n'
+            await send({
+                'type': 'http.response.body',
+                'body': body,
+                'more_body': True,
+            })
+    finally:
+        disconnect.cancel()
+        hub.unsubscribe(game_id, queue)
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.urls import reverse
+
+from scores.asgi import ScoresASGIHandler
+from scores.models import Game
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare read-only page throughput for many concurrent readers under '
+        'WSGI, stock Django ASGI and the scores ASGI handler'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--game', type=int, help='Game to read (default: the newest)'
+        )
+        parser.add_argument('--readers', type=int, default=32)
+        parser.add_argument(
+            '--requests', type=int, default=10, help='Requests per reader'
+        )
+        parser.add_argument(
+            '--host', default='localhost', help='Host header to send'
+        )
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help='Milliseconds to add to every query, to stand in for a '
+                 'database across a network'
+        )
+
+    def handle(self, *args, **options):
+        game = Game.objects.order_by('-pk')
+        if options['game'] is not None:
+            game = game.filter(pk=options['game'])
+        game = game.first()
+        if game is None:
+            raise CommandError('There is no game to read')
+        paths = [
+            reverse('scores:index'),
+            reverse('scores:game', args=(game.pk,)),
+            reverse('scores:api_scoreboard', args=(game.pk,)),
+        ]
+        # the handlers open their own connections in their own threads
+        connection.close()
+        self.host = options['host']
+        readers, per_reader = options['readers'], options['requests']
+        total = readers * per_reader
+        runs = [
+            ('wsgi', lambda: self.run_wsgi(paths, readers, per_reader)),
+            ('asgi (django)', lambda: self.run_asgi(
+                ASGIHandler(), paths, readers, per_reader
+            )),
+            ('asgi (scores)', lambda: self.run_asgi(
+                ScoresASGIHandler(), paths, readers, per_reader
+            )),
+        ]
+        self.stdout.write('%d readers x %d requests of %s' % (
+            readers, per_reader, ', '.join(paths)
+        ))
+        latency = options['latency'] / 1000
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_delay(sender, connection, **kwargs):
+            # a thread's connection object reconnects for each request
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        if latency:
+            self.stdout.write('with %g ms added to every query' % (
+                options['latency']
+            ))
+            connection_created.connect(add_delay)
+        try:
+            for name, run in runs:
+                start = time.monotonic()
+                failures = run()
+                elapsed = time.monotonic() - start
+                self.stdout.write('%-14s %8.1f requests/s  %d failed' % (
+                    name, total / elapsed, failures
+                ))
+        finally:
+            connection_created.disconnect(add_delay)
+
+    def run_wsgi(self, paths, readers, per_reader):
+        """
+        One thread per reader, as a threaded WSGI server would run them
+        """
+        handler = WSGIHandler()
+        factory = RequestFactory(HTTP_HOST=self.host)
+
+        def read(reader):
+            failures = 0
+            for i in range(per_reader):
+                path = paths[(reader + i) % len(paths)]
+                environ = factory.get(path).environ
+                statuses = []
+                response = handler(
+                    environ, lambda status, headers: statuses.append(status)
+                )
+                b''.join(response)
+                response.close()
+                if not statuses[0].startswith('200'):
+                    failures += 1
+            return failures
+
+        with ThreadPoolExecutor(max_workers=readers) as pool:
+            return sum(pool.map(read, range(readers)))
+
+    def run_asgi(self, application, paths, readers, per_reader):
+        """
+        One coroutine per reader on a single event loop, as an ASGI server
+        would run them
+        """
+        async def get(path):
+            scope = {
+                'type': 'http',
+                'method': 'GET',
+                'path': path,
+                'query_string': b'',
+                'headers': [(b'host', self.host.encode())],
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request'}
+
+            async def send(message):
+                messages.append(message)
+
+            await application(scope, receive, send)
+            return messages[0]['status']
+
+        async def read(reader):
+            failures = 0
+            for i in range(per_reader):
+                status = await get(paths[(reader + i) % len(paths)])
+                if status != 200:
+                    failures += 1
+            return failures
+
+        async def main():
+            return sum(await asyncio.gather(*[
+                read(reader) for reader in range(readers)
+            ]))
+
+        return asyncio.run(main())
@@ -0,0 +1,192 @@
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from scores.metrics import QueryTimer
+from scores.models import Game
+from scores.transfer import GameImporter, clean_game
+
+# how fast each method may grow with the number of turns, as the exponent
+# of the turn count: 0 is constant, 1 is linear
+BUDGETS = {
+    'player_order': 0,
+    'turn_number': 0,
+    'current_player': 0,
+    'next_player': 0,
+    'add_turn': 0,
+    'total_score': 0,
+    'total_scores': 0,
+}
+# query counts are exact, so only allow for rounding
+QUERY_SLACK = 0.01
+PLAYER_PREFIX = 'benchmark-'
+# outside the source tree, where a stray results file would be committed
+DEFAULT_OUTPUT = os.path.join(tempfile.gettempdir(), 'benchmark_models.json')
+
+
+def call(game, method, player):
+    if method == 'total_score':
+        return game.total_score(player)
+    return getattr(game, method)()
+
+def growth(points):
+    """
+    The least squares slope of log(value) against log(turns), given
+    (turns, value) pairs: about 0 when the value stays flat and 1 when it
+    grows in proportion to the turns
+    """
+    points = [ (math.log(n), math.log(max(v, 1e-3))) for n, v in points ]
+    mean_x = statistics.mean(x for x, y in points)
+    mean_y = statistics.mean(y for x, y in points)
+    spread = sum((x - mean_x) ** 2 for x, y in points)
+    if not spread:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+def over_budget(results, budgets, time_slack):
+    """
+    Return a message for each method and player count whose query count
+    or time grows faster with the turns than its budget allows
+    """
+    failures = []
+    series = {}
+    for row in results:
+        series.setdefault((row['method'], row['players']), []).append(row)
+    for (method, players), rows in sorted(series.items()):
+        budget = budgets[method]
+        for field, slack in [('queries', QUERY_SLACK), ('ms', time_slack)]:
+            if slack is None:
+                continue
+            slope = growth([ (row['turns'], row[field]) for row in rows ])
+            if slope > budget + slack:
+                failures.append(
+                    '%s with %d players: %s grow as turns^%.2f, over the '
+                    'budget of turns^%s' % (
+                        method, players, field, slope, budget
+                    )
+                )
+    return failures
+
+class Command(BaseCommand):
+    help = (
+        'Time the Game methods that run on every turn against games of '
+        'increasing length, and fail if any grows faster than its budget. '
+        'Games are written and timed inside a transaction that is rolled '
+        'back, so the database is left as it was.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--turns', type=int, nargs='+', default=[10, 100, 1000, 10000],
+            help='Turn counts to benchmark'
+        )
+        parser.add_argument(
+            '--players', type=int, nargs='+', default=[2, 5],
+            help='Player counts to benchmark'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Calls per method; the median time is reported'
+        )
+        parser.add_argument(
+            '--output',
+            default=DEFAULT_OUTPUT,
+            help='JSON file to write the results to (default: in the '
+                 'temporary directory)'
+        )
+        parser.add_argument(
+            '--time-slack', type=float, default=0.25,
+            help='How far above its budget a time may grow, as an exponent'
+        )
+        parser.add_argument(
+            '--no-time-budget', action='store_true',
+            help='Only hold query counts to the budgets'
+        )
+
+    def handle(self, *args, **options):
+        if len(options['turns']) < 2:
+            raise CommandError('Growth needs at least two turn counts')
+        if min(options['players']) < 1 or min(options['turns']) < 1:
+            raise CommandError('Games need at least one player and turn')
+        results = []
+        with transaction.atomic():
+            importer = GameImporter()
+            for players in options['players']:
+                for turns in options['turns']:
+                    game = self.seed(importer, players, turns)
+                    for method in BUDGETS:
+                        results.append(self.measure(
+                            game, method, players, turns, options['repeat']
+                        ))
+                        row = results[-1]
+                        self.stdout.write(
+                            '%-16s %3d players %6d turns %4d queries '
+                            '%9.3f ms' % (
+                                method, players, turns, row['queries'],
+                                row['ms']
+                            )
+                        )
+            transaction.set_rollback(True)
+        time_slack = options['time_slack']
+        if options['no_time_budget']:
+            time_slack = None
+        failures = over_budget(results, BUDGETS, time_slack)
+        with open(options['output'], 'w') as f:
+            json.dump({
+                'budgets': BUDGETS,
+                'time_slack': time_slack,
+                'results': results,
+                'failures': failures,
+            }, f, indent=2)
+        self.stdout.write('Wrote %s' % options['output'])
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def seed(self, importer, players, turns):
+        """
+        Write a game with the given number of seats and turns, and a score
+        on every other turn, in one chunk of bulk inserts
+        """
+        names = [ '%s%d' % (PLAYER_PREFIX, i) for i in range(players) ]
+        importer.write_chunk([clean_game(0, {
+            'name': 'benchmark',
+            'players': names,
+            'turns': turns,
+            'scores': [
+                {
+                    'turn': turn,
+                    'player': names[turn % players],
+                    'event': 'road',
+                    'points': 2,
+                }
+                for turn in range(0, turns, 2)
+            ],
+        })])
+        return Game.objects.order_by('-pk').first()
+
+    def measure(self, game, method, players, turns, repeat):
+        player = game.player_order()[0]
+        seconds = []
+        queries = []
+        for i in range(repeat):
+            # a fresh instance each time, so nothing is memoized
+            game = Game.objects.get(pk=game.pk)
+            timer = QueryTimer()
+            start = time.perf_counter()
+            with connection.execute_wrapper(timer):
+                call(game, method, player)
+            seconds.append(time.perf_counter() - start)
+            queries.append(timer.queries)
+        return {
+            'method': method,
+            'players': players,
+            'turns': turns,
+            'queries': max(queries),
+            'ms': statistics.median(seconds) * 1000,
+        }
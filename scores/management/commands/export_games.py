@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scores.models import Game
+from scores.transfer import WRITERS, export_games
+
+
+class Command(BaseCommand):
+    help = 'Export games with their players, turns and scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='File to write, or - for stdout (the default)'
+        )
+        parser.add_argument(
+            '--format', choices=sorted(WRITERS),
+            help='File format (default: from the file extension, or ndjson)'
+        )
+        parser.add_argument('--game', type=int, nargs='*', dest='game_ids')
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Games read per round of queries'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            file_format = 'csv' if path.endswith('.csv') else 'ndjson'
+        games = Game.objects.all()
+        if options['game_ids']:
+            games = games.filter(pk__in=options['game_ids'])
+        lines = WRITERS[file_format](
+            export_games(games, options['chunk_size'])
+        )
+        if path == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        try:
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
+        except OSError as e:
+            raise CommandError(e)
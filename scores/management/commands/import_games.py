@@ -0,0 +1,68 @@
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scores.transfer import (
+    MAX_TURNS, READERS, GameImporter, TransferError, clean_game
+)
+
+
+class Command(BaseCommand):
+    help = 'Import historical games from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin")
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='File format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Games written per transaction'
+        )
+        parser.add_argument(
+            '--max-turns', type=int, default=MAX_TURNS,
+            help='Reject games with more turns than this (default: %d)' % (
+                MAX_TURNS
+            )
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            file_format = 'csv' if path.endswith('.csv') else 'ndjson'
+        if path == '-':
+            lines = io.TextIOWrapper(
+                sys.stdin.buffer, encoding='utf-8', newline=''
+            )
+        else:
+            try:
+                lines = open(path, encoding='utf-8', newline='')
+            except OSError as e:
+                raise CommandError(e)
+        importer = GameImporter(options['chunk_size'])
+        rows = 0
+
+        def games():
+            nonlocal rows
+            for rows, game in READERS[file_format](lines):
+                yield clean_game(rows, game, options['max_turns'])
+
+        start = time.monotonic()
+        try:
+            with lines:
+                importer.run(games())
+        except TransferError as e:
+            raise CommandError('%s (%d game(s) were imported before it)' % (
+                e, importer.games
+            ))
+        elapsed = max(time.monotonic() - start, 1e-6)
+        self.stdout.write(
+            'Imported %d game(s) and %d score(s) from %d row(s) in %.1fs '
+            '(%.0f rows/s)' % (
+                importer.games, importer.scores, rows, elapsed, rows / elapsed
+            )
+        )
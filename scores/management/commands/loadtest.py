@@ -0,0 +1,193 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from scores import metrics
+from scores.models import Player
+from scores.transfer import GameImporter, clean_game
+
+MIDDLEWARE = 'scores.metrics.MetricsMiddleware'
+PLAYER_PREFIX = 'loadtest-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed the database with players and finished games, then play games '
+        'through the views from a pool of threads and report throughput, '
+        'latency and query counts per view. This writes to the configured '
+        'database, so point it at a scratch one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--players', type=int, default=20,
+            help='Players to make sure exist before playing'
+        )
+        parser.add_argument(
+            '--history', type=int, default=50,
+            help='Finished games to import before playing'
+        )
+        parser.add_argument(
+            '--games', type=int, default=8, help='Games to play'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4, help='Threads playing games'
+        )
+        parser.add_argument(
+            '--tiles', type=int, default=72,
+            help='Tiles per game; each tile after the first is a turn'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--host', default='localhost', help='Host header to send'
+        )
+
+    def handle(self, *args, **options):
+        if options['players'] < 2:
+            raise CommandError('A game needs at least two players')
+        self.tiles = options['tiles']
+        self.host = options['host']
+        rng = random.Random(options['seed'])
+        names = [
+            '%s%d' % (PLAYER_PREFIX, i) for i in range(options['players'])
+        ]
+        start = time.monotonic()
+        existing = set(Player.objects.filter(
+            name__in=names
+        ).values_list('name', flat=True))
+        Player.objects.bulk_create([
+            Player(name=name, search_name=name.casefold())
+            for name in names if name not in existing
+        ])
+        importer = GameImporter()
+        importer.run(
+            clean_game(i, self.history_game(rng, names))
+            for i in range(options['history'])
+        )
+        self.player_ids = list(Player.objects.filter(
+            name__in=names
+        ).values_list('pk', flat=True))
+        self.stdout.write('Seeded %d game(s) in %.1fs' % (
+            importer.games, time.monotonic() - start
+        ))
+
+        middleware = [MIDDLEWARE] + [
+            m for m in settings.MIDDLEWARE if m != MIDDLEWARE
+        ]
+        seeds = [ rng.random() for i in range(options['games']) ]
+        metrics.reset()
+        start = time.monotonic()
+        with override_settings(MIDDLEWARE=middleware):
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(self.play, seeds))
+        elapsed = time.monotonic() - start
+        self.report(metrics.summary(), elapsed)
+
+    def history_game(self, rng, names):
+        """
+        A finished game in the import format, with a plausible spread of
+        turn and final scores
+        """
+        players = rng.sample(names, min(len(names), rng.randint(2, 5)))
+        turns = self.tiles - 1
+        scores = []
+        for turn in range(turns):
+            if rng.random() < 0.4:
+                event = rng.choice(['road', 'city', 'city', 'monastery'])
+                scores.append({
+                    'turn': turn,
+                    'player': rng.choice(players),
+                    'event': event,
+                    'points': rng.randint(2, 20) if event != 'monastery' else 9,
+                })
+        for player in players:
+            scores.append({
+                'turn': None,
+                'player': player,
+                'event': 'field',
+                'points': 3 * rng.randint(0, 4),
+            })
+        return {
+            'name': 'loadtest history',
+            'created': None,
+            'ended': True,
+            'players': players,
+            'turns': turns,
+            'scores': scores,
+        }
+
+    def play(self, seed):
+        """
+        Play one game the way the pages do: start it, take every turn,
+        score along the way, end it and add final scores, following each
+        redirect back to the game page
+        """
+        rng = random.Random(seed)
+        client = Client(HTTP_HOST=self.host)
+        try:
+            seated = rng.sample(self.player_ids, rng.randint(2, 5))
+            data = {'name': 'loadtest'}
+            for i, pid in enumerate(seated):
+                data['player%d' % i] = pid
+            response = client.post(reverse('scores:create_game'), data)
+            if response.status_code != 302:
+                raise CommandError('create_game answered %d' % (
+                    response.status_code
+                ))
+            game_id = int(response.url.rstrip('/').rsplit('/', 1)[1])
+            client.get(response.url)
+            # the game starts on its first turn, so one tile is drawn
+            # for it and each turn that follows
+            for tile in range(self.tiles - 1):
+                if tile:
+                    client.post(
+                        reverse('scores:next_turn', args=(game_id,)),
+                        follow=True
+                    )
+                if rng.random() < 0.4:
+                    event = rng.choice(['road', 'city', 'monastery'])
+                    client.post(
+                        reverse('scores:add_turn_score', args=(game_id,)),
+                        {
+                            'add_%s_score' % event: 'Score',
+                            'player': rng.choice(seated),
+                            'tiles': rng.randint(2, 8),
+                            'coats_of_arms': rng.randint(0, 2),
+                        },
+                        follow=True
+                    )
+            client.post(reverse('scores:end_game', args=(game_id,)), follow=True)
+            for pid in seated:
+                client.post(
+                    reverse('scores:add_final_score', args=(game_id,)),
+                    {
+                        'add_final_field_score': 'Final Field',
+                        'player': pid,
+                        'cities': rng.randint(0, 4),
+                    },
+                    follow=True
+                )
+        finally:
+            connection.close()
+
+    def report(self, views, elapsed):
+        total = sum(view['count'] for view in views.values())
+        self.stdout.write('%d requests in %.1fs (%.1f requests/s)' % (
+            total, elapsed, total / elapsed
+        ))
+        self.stdout.write('%-24s %6s %8s %24s %12s' % (
+            'view', 'n', 'req/s', 'ms p50/p95/p99', 'queries'
+        ))
+        for name, view in views.items():
+            ms = view['total_ms']
+            self.stdout.write('%-24s %6d %8.1f %7.1f/%7.1f/%8.1f %5d/%-6d' % (
+                name, view['count'], view['count'] / elapsed,
+                ms['p50'], ms['p95'], ms['p99'],
+                view['queries']['p50'], view['queries']['max'],
+            ))
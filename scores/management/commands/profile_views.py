@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from scores import metrics
+from scores.models import Game
+
+MIDDLEWARE = 'scores.metrics.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        'Request pages in-process with the metrics middleware and report '
+        'query count, SQL, template and total time percentiles per view'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Paths to request (default: the index, and the game page '
+                 'and scoreboard of --game)'
+        )
+        parser.add_argument(
+            '--game', type=int, help='Game to request (default: the newest)'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=20, help='Requests per path'
+        )
+        parser.add_argument(
+            '--host', default='localhost', help='Host header to send'
+        )
+        parser.add_argument(
+            '--max-queries', type=int,
+            help='Fail if any view makes more queries than this'
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths(options['game'])
+        middleware = [MIDDLEWARE] + [
+            m for m in settings.MIDDLEWARE if m != MIDDLEWARE
+        ]
+        client = Client(HTTP_HOST=options['host'])
+        metrics.reset()
+        with override_settings(MIDDLEWARE=middleware):
+            for path in paths:
+                for i in range(options['requests']):
+                    response = client.get(path)
+                    if response.status_code != 200:
+                        raise CommandError('%s answered %d' % (
+                            path, response.status_code
+                        ))
+        views = metrics.summary()
+        self.stdout.write('%-24s %5s %12s %14s %14s %14s %8s' % (
+            'view', 'n', 'queries', 'sql ms', 'template ms', 'total ms',
+            'bytes'
+        ))
+        self.stdout.write('%-24s %5s %12s %14s %14s %14s %8s' % (
+            '', '', 'p50/max', 'p50/p99', 'p50/p99', 'p50/p99', 'p50'
+        ))
+        for name, view in views.items():
+            self.stdout.write(
+                '%-24s %5d %5d/%-6d %6.1f/%-7.1f %6.1f/%-7.1f %6.1f/%-7.1f %8d'
+                % (
+                    name, view['count'],
+                    view['queries']['p50'], view['queries']['max'],
+                    view['sql_ms']['p50'], view['sql_ms']['p99'],
+                    view['template_ms']['p50'], view['template_ms']['p99'],
+                    view['total_ms']['p50'], view['total_ms']['p99'],
+                    view['bytes']['p50'],
+                )
+            )
+        limit = options['max_queries']
+        if limit is not None:
+            over = [
+                name for name, view in views.items()
+                if view['queries']['max'] > limit
+            ]
+            if over:
+                raise CommandError('More than %d queries: %s' % (
+                    limit, ', '.join(over)
+                ))
+
+    def default_paths(self, game_id):
+        games = Game.objects.order_by('-pk')
+        if game_id is not None:
+            games = games.filter(pk=game_id)
+        game = games.first()
+        if game is None:
+            raise CommandError('There is no game to request')
+        return [
+            reverse('scores:index'),
+            reverse('scores:game', args=(game.pk,)),
+            reverse('scores:api_scoreboard', args=(game.pk,)),
+        ]
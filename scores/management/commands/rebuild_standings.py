@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from scores.models import Game
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the running totals stored on GamePlayer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('game_ids', nargs='*', type=int)
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Report drift without repairing it',
+        )
+
+    def handle(self, *args, **options):
+        games = Game.objects.order_by('pk')
+        if options['game_ids']:
+            games = games.filter(pk__in=options['game_ids'])
+        drifted = 0
+        for game in games.iterator():
+            with transaction.atomic():
+                if self.rebuild_game(game, options['check']):
+                    drifted += 1
+        if options['check'] and drifted:
+            raise CommandError('%d game(s) have drifted standings' % drifted)
+        self.stdout.write('%d game(s) %s' % (
+            drifted, 'drifted' if options['check'] else 'repaired'
+        ))
+
+    def rebuild_game(self, game, check):
+        expected = game.tally_standings()
+        drifted = False
+        for gp in game.gameplayer_set.select_for_update():
+            actual = gp.standing()
+            wanted = expected.get(gp.player_id, dict.fromkeys(actual, 0))
+            if actual == wanted:
+                continue
+            drifted = True
+            self.stderr.write('game %d, player %d: stored %r, expected %r' % (
+                game.pk, gp.player_id, actual, wanted
+            ))
+            if not check:
+                for field, value in wanted.items():
+                    setattr(gp, field, value)
+                gp.save(update_fields=list(wanted))
+        return drifted
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+
+from django.db import connection
+
+# recent requests kept per view; percentiles cover this window
+SAMPLE_SIZE = 1000
+FIELDS = ('queries', 'sql_ms', 'template_ms', 'total_ms', 'bytes')
+PERCENTILES = (50, 90, 95, 99)
+
+lock = threading.Lock()
+samples = {}
+
+
+def record(view_name, sample):
+    with lock:
+        samples.setdefault(view_name, deque(maxlen=SAMPLE_SIZE)).append(sample)
+
+def reset():
+    with lock:
+        samples.clear()
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[rank - 1]
+
+def summary():
+    """
+    For each view, the request count and the percentiles and maximum of
+    each measurement over its recent requests
+    """
+    with lock:
+        recent = { name: list(s) for name, s in samples.items() }
+    views = {}
+    for name, rows in sorted(recent.items()):
+        view = {'count': len(rows)}
+        for field in FIELDS:
+            ordered = sorted(row[field] for row in rows)
+            stats = {
+                'p%d' % p: percentile(ordered, p) for p in PERCENTILES
+            }
+            stats['max'] = ordered[-1]
+            view[field] = stats
+        views[name] = view
+    return views
+
+class QueryTimer:
+    """
+    A database execute wrapper that counts queries and adds up their time
+    """
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - start
+
+class MetricsMiddleware:
+    """
+    Record each view's query count, SQL time, template render time, total
+    time and response size. Opt in by adding it to MIDDLEWARE (settings.py
+    does when SCORES_METRICS is set); staff read the results from
+    api/metrics.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            record(match.view_name, {
+                'queries': timer.queries,
+                'sql_ms': timer.seconds * 1000,
+                'template_ms': getattr(request, 'template_seconds', 0) * 1000,
+                'total_ms': total * 1000,
+                'bytes': 0 if response.streaming else len(response.content),
+            })
+        return response
+
+    def process_template_response(self, request, response):
+        # this runs just before the handler renders the response
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.template_seconds = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,70 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:27
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_standings(apps, schema_editor):
+    GamePlayer = apps.get_model('scores', 'GamePlayer')
+    Score = apps.get_model('scores', 'Score')
+    for phase_field, game_lookup in (
+        ('turn_points', 'turn__game_id'),
+        ('final_points', 'game__id'),
+    ):
+        rows = Score.objects.filter(**{game_lookup + '__isnull': False})
+        rows = rows.values(game_lookup, 'player_id', 'event').annotate(
+            total=Sum('points')
+        )
+        for row in rows.order_by():
+            gps = GamePlayer.objects.filter(
+                game_id=row[game_lookup], player_id=row['player_id']
+            )
+            for gp in gps:
+                setattr(gp, phase_field, getattr(gp, phase_field) + row['total'])
+                event_field = '%s_points' % row['event']
+                if hasattr(gp, event_field):
+                    setattr(
+                        gp, event_field, getattr(gp, event_field) + row['total']
+                    )
+                gp.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0003_game_ended'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameplayer',
+            name='city_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='field_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='final_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='monastery_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='road_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gameplayer',
+            name='turn_points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_standings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:28
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_last_turn_number(apps, schema_editor):
+    Game = apps.get_model('scores', 'Game')
+    Turn = apps.get_model('scores', 'Turn')
+    last_turns = Turn.objects.filter(game_id=OuterRef('pk')).order_by('-number')
+    Game.objects.update(
+        last_turn_number=Subquery(last_turns.values('number')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0004_gameplayer_standings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='last_turn_number',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='turn',
+            index=models.Index(fields=['game', 'number'], name='scores_turn_game_id_b36ad3_idx'),
+        ),
+        migrations.RunPython(
+            populate_last_turn_number, migrations.RunPython.noop
+        ),
+    ]
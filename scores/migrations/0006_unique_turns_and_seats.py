@@ -0,0 +1,52 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:29
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def renumber_duplicates(apps, schema_editor):
+    """
+    Renumber the turns and seats of any game that would violate the new
+    unique constraints, keeping their existing relative order
+    """
+    Game = apps.get_model('scores', 'Game')
+    Turn = apps.get_model('scores', 'Turn')
+    GamePlayer = apps.get_model('scores', 'GamePlayer')
+    duplicate_turns = Turn.objects.values('game_id', 'number').annotate(
+        n=Count('id')
+    ).filter(n__gt=1).values_list('game_id', flat=True)
+    for game_id in set(duplicate_turns):
+        turns = Turn.objects.filter(game_id=game_id).order_by('number', 'id')
+        for number, turn in enumerate(turns):
+            Turn.objects.filter(pk=turn.pk).update(number=number)
+        Game.objects.filter(pk=game_id).update(last_turn_number=number)
+    duplicate_seats = GamePlayer.objects.values('game_id', 'order').annotate(
+        n=Count('id')
+    ).filter(n__gt=1).values_list('game_id', flat=True)
+    for game_id in set(duplicate_seats):
+        seats = GamePlayer.objects.filter(game_id=game_id).order_by('order', 'id')
+        for order, seat in enumerate(seats):
+            GamePlayer.objects.filter(pk=seat.pk).update(order=order)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0005_game_last_turn_number'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='gameplayer',
+            constraint=models.UniqueConstraint(fields=('game', 'order'), name='unique_seat_order'),
+        ),
+        migrations.AddConstraint(
+            model_name='turn',
+            constraint=models.UniqueConstraint(fields=('game', 'number'), name='unique_turn_number'),
+        ),
+        migrations.RemoveIndex(
+            model_name='turn',
+            name='scores_turn_game_id_b36ad3_idx',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0006_unique_turns_and_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='created',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['-created', '-id'], name='game_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['ended', '-created', '-id'], name='game_status_idx'),
+        ),
+    ]
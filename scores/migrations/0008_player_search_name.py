@@ -0,0 +1,27 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+def populate_search_name(apps, schema_editor):
+    Player = apps.get_model('scores', 'Player')
+    for player in Player.objects.only('name').iterator():
+        Player.objects.filter(pk=player.pk).update(
+            search_name=player.name.casefold()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0007_game_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(populate_search_name, migrations.RunPython.noop),
+    ]
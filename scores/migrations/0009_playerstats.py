@@ -0,0 +1,53 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+EVENT_FIELDS = ('road_points', 'city_points', 'monastery_points', 'field_points')
+
+
+def populate_player_stats(apps, schema_editor):
+    GamePlayer = apps.get_model('scores', 'GamePlayer')
+    PlayerStats = apps.get_model('scores', 'PlayerStats')
+    seats = GamePlayer.objects.filter(game__ended=True).order_by('game_id')
+    best = {}
+    for seat in seats.iterator():
+        total = seat.turn_points + seat.final_points
+        best[seat.game_id] = max(best.get(seat.game_id, total), total)
+    stats = {}
+    for seat in seats.iterator():
+        s = stats.setdefault(seat.player_id, PlayerStats(player_id=seat.player_id))
+        total = seat.turn_points + seat.final_points
+        s.games_played += 1
+        if total >= best[seat.game_id]:
+            s.wins += 1
+        s.total_points += total
+        s.best_score = max(s.best_score, total)
+        for field in EVENT_FIELDS:
+            setattr(s, field, getattr(s, field) + getattr(seat, field))
+    PlayerStats.objects.bulk_create(stats.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0008_player_search_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='scores.Player')),
+                ('games_played', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('total_points', models.IntegerField(default=0)),
+                ('best_score', models.IntegerField(default=0)),
+                ('road_points', models.IntegerField(default=0)),
+                ('city_points', models.IntegerField(default=0)),
+                ('monastery_points', models.IntegerField(default=0)),
+                ('field_points', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_player_stats, migrations.RunPython.noop),
+    ]
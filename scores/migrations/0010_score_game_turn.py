@@ -0,0 +1,33 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0009_playerstats'),
+    ]
+
+    operations = [
+        # The reverse accessors are hidden until the many-to-many fields
+        # they replace are removed in 0012.
+        migrations.AddField(
+            model_name='score',
+            name='game',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='scores.Game'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='turn',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='scores.Turn'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='is_final',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['game', 'player'], name='score_game_player_idx'),
+        ),
+    ]
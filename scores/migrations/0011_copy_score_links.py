@@ -0,0 +1,69 @@
+from django.db import migrations, transaction
+from django.db.models import Exists, Max, Min, OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def copy_score_links(apps, schema_editor):
+    """
+    Copy each score's turn and game from the many-to-many tables onto the
+    score itself. Works through the scores in id ranges, committing each
+    range separately so a large live database is never locked for long.
+    """
+    Score = apps.get_model('scores', 'Score')
+    Turn = apps.get_model('scores', 'Turn')
+    Game = apps.get_model('scores', 'Game')
+    TurnScore = Turn._meta.get_field('scores').remote_field.through
+    FinalScore = Game._meta.get_field('final_scores').remote_field.through
+    turn_links = TurnScore.objects.filter(score_id=OuterRef('pk'))
+    final_links = FinalScore.objects.filter(score_id=OuterRef('pk'))
+    turns = Turn.objects.filter(pk=OuterRef('turn_id'))
+    bounds = Score.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+        batch = Score.objects.filter(pk__gte=start, pk__lt=start + BATCH_SIZE)
+        with transaction.atomic():
+            batch.filter(Exists(turn_links)).update(
+                turn_id=Subquery(turn_links.values('turn_id')[:1])
+            )
+            batch.filter(turn_id__isnull=False).update(
+                game_id=Subquery(turns.values('game_id')[:1])
+            )
+            batch.filter(Exists(final_links)).update(
+                game_id=Subquery(final_links.values('game_id')[:1]),
+                is_final=True,
+            )
+
+
+def copy_score_links_back(apps, schema_editor):
+    Score = apps.get_model('scores', 'Score')
+    Turn = apps.get_model('scores', 'Turn')
+    Game = apps.get_model('scores', 'Game')
+    TurnScore = Turn._meta.get_field('scores').remote_field.through
+    FinalScore = Game._meta.get_field('final_scores').remote_field.through
+    scores = Score.objects.filter(game_id__isnull=False).order_by('pk')
+    turn_links = []
+    final_links = []
+    for score in scores.iterator():
+        if score.is_final:
+            final_links.append(
+                FinalScore(game_id=score.game_id, score_id=score.pk)
+            )
+        elif score.turn_id is not None:
+            turn_links.append(TurnScore(turn_id=score.turn_id, score_id=score.pk))
+    TurnScore.objects.bulk_create(turn_links, batch_size=BATCH_SIZE)
+    FinalScore.objects.bulk_create(final_links, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('scores', '0010_score_game_turn'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_score_links, copy_score_links_back),
+    ]
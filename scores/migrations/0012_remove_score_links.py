@@ -0,0 +1,30 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0011_copy_score_links'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='game',
+            name='final_scores',
+        ),
+        migrations.RemoveField(
+            model_name='turn',
+            name='scores',
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='game',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='scores.Game'),
+        ),
+        migrations.AlterField(
+            model_name='score',
+            name='turn',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='scores.Turn'),
+        ),
+    ]
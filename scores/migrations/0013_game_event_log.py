@@ -0,0 +1,79 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import json
+
+STANDING_FIELDS = (
+    'turn_points', 'final_points',
+    'road_points', 'city_points', 'monastery_points', 'field_points',
+)
+
+
+def snapshot_existing_games(apps, schema_editor):
+    """
+    Games from before the event log start from a snapshot of their
+    current running totals
+    """
+    Game = apps.get_model('scores', 'Game')
+    GamePlayer = apps.get_model('scores', 'GamePlayer')
+    GameSnapshot = apps.get_model('scores', 'GameSnapshot')
+    snapshots = []
+    for game in Game.objects.order_by('pk').iterator():
+        seats = GamePlayer.objects.filter(game_id=game.pk).order_by('order')
+        state = {
+            'players': [],
+            'turn_number': game.last_turn_number,
+            'ended': game.ended,
+            'standings': {},
+        }
+        if state['turn_number'] is None:
+            state['turn_number'] = -1
+        for seat in seats:
+            state['players'].append(seat.player_id)
+            state['standings'][str(seat.player_id)] = {
+                field: getattr(seat, field) for field in STANDING_FIELDS
+            }
+        snapshots.append(GameSnapshot(
+            game_id=game.pk, last_event_id=0, state=json.dumps(state)
+        ))
+        if len(snapshots) >= 1000:
+            GameSnapshot.objects.bulk_create(snapshots)
+            snapshots = []
+    GameSnapshot.objects.bulk_create(snapshots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0012_remove_score_links'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.IntegerField(default=0)),
+                ('state', models.TextField()),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='scores.Game')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GameEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('data', models.TextField(default='{}')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='scores.Game')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='gamesnapshot',
+            index=models.Index(fields=['game', '-last_event_id'], name='snapshot_latest_idx'),
+        ),
+        migrations.RunPython(snapshot_existing_games, migrations.RunPython.noop),
+    ]
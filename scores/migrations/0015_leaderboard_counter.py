@@ -0,0 +1,20 @@
+# Generated by Django 3.0.14 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0014_game_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
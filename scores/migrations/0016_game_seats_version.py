@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scores', '0015_leaderboard_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='seats_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,31 +1,237 @@
-from django.db import models
+import json
+
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .signals import game_changed
+
+class PlayerManager(models.Manager):
+    def name_prefix(self, prefix):
+        """
+        Return players whose name starts with prefix, ignoring case. Uses a
+        range over the indexed search_name so it works on any backend.
+        """
+        prefix = prefix.casefold()
+        players = self.order_by('search_name', 'pk')
+        if prefix:
+            players = players.filter(
+                search_name__gte=prefix,
+                search_name__lt=prefix + '\U0010ffff'
+            )
+        return players
 
 class Player(models.Model):
     name = models.CharField(max_length=200)
+    # casefolded name for case-insensitive prefix search
+    search_name = models.CharField(
+        max_length=200, db_index=True, editable=False, default=''
+    )
+
+    objects = PlayerManager()
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = self.name.casefold()
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            # a new name has to reach cached pages and ETags of their games
+            Game.objects.filter(gameplayer__player_id=self.pk).update(
+                version=F('version') + 1,
+                seats_version=F('seats_version') + 1
+            )
+            Counter.objects.bump(Counter.LEADERBOARD)
+
 class Score(models.Model):
     event = models.CharField(max_length=10) # road, city, monastery, or field
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
     points = models.IntegerField(default=0)
+    game = models.ForeignKey('Game', on_delete=models.CASCADE, null=True)
+    # set for scores made during a turn, null for final scores
+    turn = models.ForeignKey(
+        'Turn', on_delete=models.CASCADE, null=True, related_name='scores'
+    )
+    is_final = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['game', 'player'], name='score_game_player_idx'),
+        ]
+
+def score_points(event, final, tiles=0, coats_of_arms=0, cities=0):
+    """
+    Return the points for a feature. Completed features score during the
+    game; incomplete ones, and fields, score at the end (final=True).
+    Raises ValueError for a feature that can't score in that phase.
+    """
+    tiles = int(tiles)
+    coats_of_arms = int(coats_of_arms)
+    if event == 'monastery':
+        return tiles if final else 9
+    if event == 'road':
+        return tiles
+    if event == 'city':
+        return tiles + coats_of_arms if final else (tiles + coats_of_arms)*2
+    if event == 'field' and final:
+        return int(cities) * 3
+    raise ValueError('%s cannot score %s' % (
+        event, 'at the end' if final else 'during the game'
+    ))
+
+def score_event_data(score):
+    return {
+        'score': score.pk,
+        'player': int(score.player_id),
+        'event': score.event,
+        'points': score.points,
+        'final': score.is_final,
+    }
+
+def create_scores(scores):
+    """
+    Insert unsaved Score objects, making sure each gets its primary key
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Score.objects.bulk_create(scores)
+    # this backend can't report the keys of bulk inserted rows
+    for score in scores:
+        score.save()
+    return scores
+
+def add_deltas(changes, player_id, deltas):
+    """
+    Add one player's standing deltas to a dict of them by player id
+    """
+    mine = changes.setdefault(int(player_id), {})
+    for field, delta in deltas.items():
+        mine[field] = mine.get(field, 0) + delta
+
+class GameManager(models.Manager):
+    def with_summary(self):
+        """
+        Annotate each game with its player count, turn count and leader
+        """
+        seats = GamePlayer.objects.filter(game_id=OuterRef('pk')).annotate(
+            total=F('turn_points') + F('final_points')
+        ).order_by('-total', 'order')
+        return self.annotate(
+            player_count=Count('gameplayer'),
+            turn_count=Coalesce(F('last_turn_number'), Value(-1)) + 1,
+            leader_name=Subquery(seats.values('player__name')[:1]),
+            leader_points=Subquery(seats.values('total')[:1]),
+        )
+
+    def create_with_players(self, name, player_ids):
+        """
+        Create a game, its seats and its first turn in one transaction.
+        Raises ValueError if the player ids are missing, repeated or unknown.
+        """
+        player_ids = [ int(pid) for pid in player_ids ]
+        if len(player_ids) == 0:
+            raise ValueError('A game needs at least one player')
+        if len(set(player_ids)) != len(player_ids):
+            raise ValueError('A player can only take one seat')
+        known = set(
+            Player.objects.filter(pk__in=player_ids).values_list('pk', flat=True)
+        )
+        unknown = [ pid for pid in player_ids if pid not in known ]
+        if unknown:
+            raise ValueError(
+                'Unknown player id: %s' % ', '.join(map(str, unknown))
+            )
+        with transaction.atomic():
+            # version 1 counts the seats and first turn logged below
+            game = self.create(name=name, last_turn_number=0, version=1)
+            GamePlayer.objects.bulk_create([
+                GamePlayer(game=game, player_id=pid, order=i)
+                for i, pid in enumerate(player_ids)
+            ])
+            Turn.objects.create(game=game, player_id=player_ids[0], number=0)
+            GameEvent.objects.bulk_create([
+                GameEvent.for_game(game, 'player', player=pid, order=i)
+                for i, pid in enumerate(player_ids)
+            ] + [
+                GameEvent.for_game(game, 'turn', number=0, player=player_ids[0])
+            ])
+        return game
 
 class Game(models.Model):
     name = models.CharField(max_length=200)
-    final_scores = models.ManyToManyField(Score, blank=True)
     ended = models.BooleanField(default=False)
+    # number of the latest turn, maintained by add_turn; null when unknown
+    last_turn_number = models.IntegerField(null=True, blank=True)
+    created = models.DateTimeField(default=timezone.now)
+    # bumped by every logged change and by renaming a seated player, for
+    # conditional requests and caching
+    version = models.PositiveIntegerField(default=0)
+    # bumped only by a new seat or a renamed player, for the cached
+    # fragments that show nothing but the players
+    seats_version = models.PositiveIntegerField(default=0)
+
+    objects = GameManager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the index page, newest first
+            models.Index(fields=['-created', '-id'], name='game_created_idx'),
+            models.Index(
+                fields=['ended', '-created', '-id'], name='game_status_idx'
+            ),
+        ]
+
+    def memoized(self, key, compute):
+        """
+        Return compute() the first time key is asked for, and the same
+        value afterwards until invalidate() is called. Views load a fresh
+        Game for each request, so this lasts for a single request.
+        """
+        memo = self.__dict__.setdefault('_memo', {})
+        if key not in memo:
+            memo[key] = compute()
+        return memo[key]
+
+    def invalidate(self):
+        self.__dict__.pop('_memo', None)
+
+    def changed(self, kind, score=None):
+        """
+        Forget memoized state and tell receivers what changed
+        """
+        self.invalidate()
+        game_changed.send(sender=Game, game=self, kind=kind, score=score)
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.invalidate()
+        super().refresh_from_db(*args, **kwargs)
+
+    def seats(self):
+        return self.memoized('seats', self._load_seats)
+
+    def _load_seats(self):
+        return list(
+            self.gameplayer_set.select_related('player').order_by('order')
+        )
 
     def player_order(self):
-        gps = self.gameplayer_set.order_by('order')
-        return [ gp.player for gp in gps ]
+        return [ gp.player for gp in self.seats() ]
 
     def turn_number(self):
-        turns = self.turn_set.order_by('number')
-        if len(turns) == 0:
+        return self.memoized('turn_number', self._load_turn_number)
+
+    def _load_turn_number(self):
+        number = Game.objects.filter(pk=self.pk).values_list(
+            'last_turn_number', flat=True
+        ).first()
+        if number is None:
+            # turns added without add_turn; use the (game, number) index
+            number = self.turn_set.aggregate(Max('number'))['number__max']
+        if number is None:
             return -1
-        else:
-            return turns.reverse()[0].number
+        return number
 
     def current_player(self):
         players = self.player_order()
@@ -40,94 +246,371 @@ class Game(models.Model):
         return players[(turn + 1) % player_count]
 
     def add_player(self, player_id):
-        player_count = GamePlayer.objects.filter(game_id = self.pk).count()
-        gp = GamePlayer(
-            game_id=self.pk,
-            player_id=player_id,
-            order=player_count + 1
-        )
-        gp.save()
+        with transaction.atomic():
+            # Write to the game row before counting seats, so concurrent
+            # callers queue on its write lock (select_for_update does
+            # nothing on SQLite) and can't give two seats the same order.
+            Game.objects.filter(pk=self.pk).update(
+                seats_version=F('seats_version') + 1
+            )
+            self.seats_version += 1
+            player_count = GamePlayer.objects.filter(game_id = self.pk).count()
+            gp = GamePlayer(
+                game_id=self.pk,
+                player_id=player_id,
+                order=player_count + 1
+            )
+            gp.save()
+            self.record('player', player=int(player_id), order=gp.order)
+        self.changed('player')
 
     def add_turn(self):
-        return self.turn_set.create(
-            player_id = self.next_player().pk,
-            number = self.turn_number() + 1
-        )
+        players = self.player_order()
+        with transaction.atomic():
+            # Claim the next number with a single UPDATE before reading
+            # anything, so concurrent callers queue on the game row's
+            # write lock instead of reading the same counter.
+            highest = self.turn_set.filter(game_id=OuterRef('pk')).order_by(
+                '-number'
+            ).values('number')[:1]
+            Game.objects.filter(pk=self.pk).update(last_turn_number=Coalesce(
+                F('last_turn_number'), Subquery(highest), Value(-1)
+            ) + 1)
+            number = Game.objects.values_list(
+                'last_turn_number', flat=True
+            ).get(pk=self.pk)
+            turn = self.turn_set.create(
+                player_id = players[number % len(players)].pk,
+                number = number
+            )
+            self.record('turn', number=number, player=turn.player_id)
+        self.last_turn_number = number
+        self.changed('turn')
+        return turn
+
+    def end_game(self):
+        """
+        End the game and add it to its players' stats. Returns False, and
+        changes nothing, if it had already ended.
+        """
+        with transaction.atomic():
+            # a conditional UPDATE, so two requests can't both end it
+            updated = Game.objects.filter(pk=self.pk, ended=False).update(
+                ended=True
+            )
+            self.ended = True
+            if not updated:
+                return False
+            PlayerStats.objects.add_game(self.pk)
+            self.record('ended')
+        self.changed('ended')
+        return True
+
+    def seat_player_ids(self):
+        return [ gp.player_id for gp in self.seats() ]
 
     def is_ended(self):
         return self.ended
 
+    @property
+    def final_scores(self):
+        return self.score_set.filter(is_final=True)
+
     def current_turn(self):
+        return self.memoized('current_turn', self._load_current_turn)
+
+    def _load_current_turn(self):
         #TODO: handle the case when there are no turns
-        return self.turn_set.order_by('number').reverse()[0]
+        return self.turn_set.get(number=self.turn_number())
 
     def score_completed_monastery(self, player_id):
         #TODO: handle the case when there are no turns here too?
-        return self.current_turn().scores.create(
-            event='monastery',
-            player_id=player_id,
-            points=9
+        return self.add_turn_score(
+            player_id, 'monastery', score_points('monastery', final=False)
         )
 
     def score_incomplete_monastery(self, player_id, tiles):
-        return self.final_scores.create(
-            event='monastery',
-            player_id=player_id,
-            points=int(tiles)
+        return self.add_final_score(
+            player_id, 'monastery',
+            score_points('monastery', final=True, tiles=tiles)
         )
 
     def score_completed_road(self, player_id, tiles):
-        return self.current_turn().scores.create(
-            event='road',
-            player_id=player_id,
-            points=int(tiles)
+        return self.add_turn_score(
+            player_id, 'road', score_points('road', final=False, tiles=tiles)
         )
 
     def score_incomplete_road(self, player_id, tiles):
-        return self.final_scores.create(
-            event='road',
-            player_id=player_id,
-            points=int(tiles)
+        return self.add_final_score(
+            player_id, 'road', score_points('road', final=True, tiles=tiles)
         )
 
     def score_completed_city(self, player_id, tiles, coats_of_arms):
-        return self.current_turn().scores.create(
-            event='city',
-            player_id=player_id,
-            points=(int(tiles) + int(coats_of_arms))*2
-        )
+        return self.add_turn_score(player_id, 'city', score_points(
+            'city', final=False, tiles=tiles, coats_of_arms=coats_of_arms
+        ))
 
     def score_incomplete_city(self, player_id, tiles, coats_of_arms):
-        return self.final_scores.create(
-            event='city',
-            player_id=player_id,
-            points=int(tiles) + int(coats_of_arms)
-        )
+        return self.add_final_score(player_id, 'city', score_points(
+            'city', final=True, tiles=tiles, coats_of_arms=coats_of_arms
+        ))
 
     def score_field(self, player_id, cities):
-        return self.final_scores.create(
-            event='field',
-            player_id=player_id,
-            points=int(cities) * 3
+        return self.add_final_score(
+            player_id, 'field', score_points('field', final=True, cities=cities)
         )
 
+    def add_turn_score(self, player_id, event, points):
+        # read before the transaction so it only holds write locks
+        turn = self.current_turn()
+        with transaction.atomic():
+            score = Score.objects.create(
+                game_id=self.pk,
+                turn=turn,
+                event=event,
+                player_id=player_id,
+                points=points
+            )
+            self.update_standing(score.player_id, 'turn_points', score)
+            self.record('score', **score_event_data(score))
+        self.changed('turn_score', score)
+        return score
+
+    def add_final_score(self, player_id, event, points):
+        with transaction.atomic():
+            score = Score.objects.create(
+                game_id=self.pk,
+                is_final=True,
+                event=event,
+                player_id=player_id,
+                points=points
+            )
+            deltas = self.update_standing(
+                score.player_id, 'final_points', score
+            )
+            self.record('score', **score_event_data(score))
+            if self.ended:
+                PlayerStats.objects.update_game(
+                    self.pk, {int(score.player_id): deltas}
+                )
+        self.changed('final_score', score)
+        return score
+
+    def add_scores(self, turn_scores, final_scores):
+        """
+        Record many unsaved Score objects at once: turn_scores against the
+        current turn and final_scores against the game. The scores and the
+        running totals are written with a handful of bulk statements in
+        one transaction.
+        """
+        turn = self.current_turn() if turn_scores else None
+        for score in turn_scores:
+            score.game_id = self.pk
+            score.turn = turn
+        for score in final_scores:
+            score.game_id = self.pk
+            score.is_final = True
+        with transaction.atomic():
+            create_scores(turn_scores + final_scores)
+            changes = {}
+            for phase_field, scores in (
+                ('turn_points', turn_scores),
+                ('final_points', final_scores),
+            ):
+                for player_id in set(s.player_id for s in scores):
+                    mine = [ s for s in scores if s.player_id == player_id ]
+                    add_deltas(changes, player_id, self.update_standing(
+                        player_id, phase_field, *mine
+                    ))
+            self.log(*[
+                GameEvent.for_game(self, 'score', **score_event_data(s))
+                for s in turn_scores + final_scores
+            ])
+            if self.ended:
+                PlayerStats.objects.update_game(self.pk, changes)
+        self.changed('final_score' if final_scores else 'turn_score')
+        return turn_scores + final_scores
+
+    def update_standing(self, player_id, phase_field, *scores, sign=1):
+        """
+        Add new scores for one player and phase to that player's running
+        totals with a single UPDATE, or take them away if sign is -1.
+        Returns the change to each standing field.
+        """
+        deltas = {}
+        for score in scores:
+            event_field = '%s_points' % score.event
+            for field in (phase_field, event_field):
+                deltas[field] = deltas.get(field, 0) + sign * score.points
+        self.gameplayer_set.filter(player_id=player_id).update(**{
+            field: F(field) + delta for field, delta in deltas.items()
+        })
+        return deltas
+
+    def undo_last_score(self):
+        """
+        Remove the most recently recorded score and take it off the running
+        totals. Returns the removed score, or None if there are none.
+        """
+        with transaction.atomic():
+            score = self.score_set.order_by('-pk').first()
+            if score is None:
+                return None
+            phase_field = 'final_points' if score.is_final else 'turn_points'
+            deltas = self.update_standing(
+                score.player_id, phase_field, score, sign=-1
+            )
+            self.record('undo', **score_event_data(score))
+            score.delete()
+            if self.ended:
+                PlayerStats.objects.update_game(
+                    self.pk, {int(score.player_id): deltas}
+                )
+        self.changed('undo', score)
+        return score
+
+    def edit_score(self, score_id, player_id, event, points):
+        """
+        Correct a recorded score, moving its old points off the running
+        totals and its new ones on. Returns the edited score.
+        """
+        with transaction.atomic():
+            score = self.score_set.select_for_update().get(pk=score_id)
+            phase_field = 'final_points' if score.is_final else 'turn_points'
+            old = score_event_data(score)
+            changes = {}
+            add_deltas(changes, score.player_id, self.update_standing(
+                score.player_id, phase_field, score, sign=-1
+            ))
+            score.player_id = player_id
+            score.event = event
+            score.points = points
+            score.save(update_fields=['player', 'event', 'points'])
+            add_deltas(changes, score.player_id, self.update_standing(
+                score.player_id, phase_field, score
+            ))
+            self.record('edit', old=old, new=score_event_data(score))
+            if self.ended:
+                PlayerStats.objects.update_game(self.pk, changes)
+        self.changed('edit', score)
+        return score
+
+    def record(self, kind, **data):
+        """
+        Append an event to the game's log
+        """
+        self.log(GameEvent.for_game(self, kind, **data))
+
+    def log(self, *events):
+        """
+        Save unsaved events to the game's log and bump its version once
+        """
+        GameEvent.objects.bulk_create(events)
+        Game.objects.filter(pk=self.pk).update(version=F('version') + 1)
+        self.version += 1
+
+    def etag(self):
+        return '"%d-%d"' % (self.pk, self.version)
+
+    def replay(self):
+        """
+        Rebuild the game's state from its latest snapshot and the events
+        logged since. If that took a long run of events, snapshot the result
+        so the next replay starts from here.
+        """
+        snapshot = self.gamesnapshot_set.order_by('-last_event_id').first()
+        if snapshot is None:
+            state, last_event_id = GameSnapshot.empty_state(), 0
+        else:
+            state, last_event_id = snapshot.load(), snapshot.last_event_id
+        events = self.gameevent_set.filter(pk__gt=last_event_id).order_by('pk')
+        count = 0
+        for event in events:
+            event.apply(state)
+            last_event_id = event.pk
+            count += 1
+        if count >= GameSnapshot.INTERVAL:
+            GameSnapshot.objects.create(
+                game=self, last_event_id=last_event_id, state=json.dumps(state)
+            )
+        return state
+
     def total_scores(self):
-        return [ [p, self.total_score(p)] for p in self.player_order() ]
+        return [ [gp.player, gp.total_points()] for gp in self.seats() ]
 
     def total_score(self, player):
-        total = 0
-        for t in self.turn_set.all():
-            for s in t.scores.filter(player_id = player.pk):
-                total += s.points
-        for s in self.final_scores.filter(player_id = player.pk):
-            total += s.points
-        return total
+        gp = self.gameplayer_set.filter(player_id=player.pk).first()
+        if gp is None:
+            return 0
+        return gp.total_points()
+
+    def score_timeline(self):
+        """
+        Each player's cumulative score after every turn, and with final
+        scores added. One query sums the points per turn and player; the
+        running totals are added up here rather than asked of the database
+        turn by turn.
+        """
+        last = self.last_turn_number
+        if last is None:
+            last = self.turn_number()
+        rows = self.score_set.values('turn__number', 'player_id').annotate(
+            total=Sum('points')
+        ).order_by()
+        turn_points = {}
+        final_points = {}
+        for row in rows:
+            if row['turn__number'] is None:
+                final_points[row['player_id']] = row['total']
+            else:
+                key = (row['turn__number'], row['player_id'])
+                turn_points[key] = row['total']
+        timeline = []
+        for player in self.player_order():
+            running = 0
+            totals = []
+            for number in range(last + 1):
+                running += turn_points.get((number, player.pk), 0)
+                totals.append(running)
+            timeline.append({
+                'player': player,
+                'totals': totals,
+                'final': running + final_points.get(player.pk, 0),
+            })
+        return timeline
+
+    def tally_standings(self):
+        """
+        Recompute everyone's running totals from the raw Score rows.
+        Returns a dict mapping player id to a dict of standing fields.
+        """
+        standings = {}
+        rows = self.score_set.values('player_id', 'event', 'is_final').annotate(
+            total=Sum('points')
+        )
+        for row in rows.order_by():
+            standing = standings.setdefault(
+                row['player_id'],
+                dict.fromkeys(GamePlayer.STANDING_FIELDS, 0)
+            )
+            phase_field = 'final_points' if row['is_final'] else 'turn_points'
+            standing[phase_field] += row['total']
+            event_field = '%s_points' % row['event']
+            if event_field in standing:
+                standing[event_field] += row['total']
+        return standings
 
 class Turn(models.Model):
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
     number = models.IntegerField(default=0)
-    scores = models.ManyToManyField(Score)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['game', 'number'], name='unique_turn_number'
+            ),
+        ]
 
     def __str__(self):
         return "number=%d, game_id=%d, player_id=%d" % (
@@ -135,6 +618,271 @@ class Turn(models.Model):
         )
 
 class GamePlayer(models.Model):
+    EVENT_FIELDS = (
+        'road_points', 'city_points', 'monastery_points', 'field_points',
+    )
+    STANDING_FIELDS = ('turn_points', 'final_points') + EVENT_FIELDS
+
     order = models.IntegerField(default=0)
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
     player = models.ForeignKey(Player, on_delete=models.CASCADE)
+    # running totals, kept up to date by Game.update_standing
+    turn_points = models.IntegerField(default=0)
+    final_points = models.IntegerField(default=0)
+    road_points = models.IntegerField(default=0)
+    city_points = models.IntegerField(default=0)
+    monastery_points = models.IntegerField(default=0)
+    field_points = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['game', 'order'], name='unique_seat_order'
+            ),
+        ]
+
+    def total_points(self):
+        return self.turn_points + self.final_points
+
+    def standing(self):
+        return { f: getattr(self, f) for f in self.STANDING_FIELDS }
+
+def game_contributions(standings):
+    """
+    What each seat of an ended game adds to its player's career stats,
+    given the seats' standing dicts by player id
+    """
+    totals = {
+        pid: standing['turn_points'] + standing['final_points']
+        for pid, standing in standings.items()
+    }
+    best = max(totals.values(), default=0)
+    contributions = {}
+    for pid, standing in standings.items():
+        contribution = {
+            'games_played': 1,
+            'wins': int(totals[pid] >= best),
+            'total_points': totals[pid],
+        }
+        for field in GamePlayer.EVENT_FIELDS:
+            contribution[field] = standing[field]
+        contributions[pid] = contribution
+    return contributions
+
+class PlayerStatsManager(models.Manager):
+    # the stats that are sums of each game's contribution
+    COUNTED_FIELDS = (
+        'games_played', 'wins', 'total_points'
+    ) + GamePlayer.EVENT_FIELDS
+
+    def refresh(self, player_ids):
+        """
+        Recompute the career stats of the given players from the running
+        totals of their ended games, which is one row per game played
+        """
+        best_in_game = GamePlayer.objects.filter(
+            game_id=OuterRef('game_id')
+        ).annotate(
+            total=F('turn_points') + F('final_points')
+        ).order_by('-total').values('total')[:1]
+        player_ids = [ int(pid) for pid in player_ids ]
+        seats = GamePlayer.objects.filter(
+            player_id__in=player_ids, game__ended=True
+        ).annotate(game_best=Subquery(best_in_game))
+        stats = { pid: PlayerStats(player_id=pid) for pid in player_ids }
+        for seat in seats:
+            s = stats[seat.player_id]
+            total = seat.total_points()
+            s.games_played += 1
+            if total >= seat.game_best:
+                s.wins += 1
+            s.total_points += total
+            s.best_score = max(s.best_score, total)
+            for field in GamePlayer.EVENT_FIELDS:
+                setattr(s, field, getattr(s, field) + getattr(seat, field))
+        with transaction.atomic():
+            self.filter(player_id__in=player_ids).delete()
+            self.bulk_create(stats.values())
+
+    def add_game(self, game_id):
+        """
+        Add a game that has just ended to its players' stats
+        """
+        self.update_game(game_id, None)
+
+    def update_game(self, game_id, changes):
+        """
+        Move an ended game's contribution to its players' stats from what
+        it was before a change to what it is now, touching only this game.
+        changes maps player ids to the standing deltas the change made, or
+        is None if the game wasn't counted before. A player's career is
+        only rescanned if the game may have held their best score, or they
+        have no stats row yet.
+        """
+        now = {
+            row.pop('player_id'): row for row in
+            GamePlayer.objects.filter(game_id=game_id).values(
+                'player_id', *GamePlayer.STANDING_FIELDS
+            )
+        }
+        after = game_contributions(now)
+        before = {}
+        if changes is not None:
+            before = game_contributions({
+                pid: {
+                    f: v - changes.get(pid, {}).get(f, 0)
+                    for f, v in standing.items()
+                }
+                for pid, standing in now.items()
+            })
+        for pid, new in after.items():
+            old = before.get(pid, dict.fromkeys(self.COUNTED_FIELDS, 0))
+            deltas = {
+                f: new[f] - old[f] for f in self.COUNTED_FIELDS
+                if new[f] != old[f]
+            }
+            if not deltas and pid in before:
+                continue
+            best = Greatest(F('best_score'), Value(new['total_points']))
+            updated = self.filter(player_id=pid).update(
+                best_score=best,
+                **{ f: F(f) + delta for f, delta in deltas.items() }
+            )
+            if not updated:
+                self.refresh([pid])
+            elif pid in before and new['total_points'] < old['total_points']:
+                best = GamePlayer.objects.filter(
+                    player_id=pid, game__ended=True
+                ).aggregate(best=Max(F('turn_points') + F('final_points')))
+                self.filter(player_id=pid).update(best_score=best['best'] or 0)
+        Counter.objects.bump(Counter.LEADERBOARD)
+
+class CounterManager(models.Manager):
+    def read(self, name):
+        value = self.filter(name=name).values_list('value', flat=True).first()
+        return value or 0
+
+    def bump(self, name):
+        """
+        Add one to a counter, creating it on its first bump
+        """
+        if not self.filter(name=name).update(value=F('value') + 1):
+            _, created = self.get_or_create(name=name, defaults={'value': 1})
+            if not created:
+                self.filter(name=name).update(value=F('value') + 1)
+
+class Counter(models.Model):
+    """
+    A named number that writes bump so that every process can tell,
+    with one primary key lookup, that something they cached has changed
+    """
+    # bumped whenever an ended game, and so the leaderboard, changes
+    LEADERBOARD = 'leaderboard'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.PositiveIntegerField(default=0)
+
+    objects = CounterManager()
+
+    def __str__(self):
+        return '%s: %d' % (self.name, self.value)
+
+class PlayerStats(models.Model):
+    """
+    A player's career totals over ended games. Game.end_game adds each
+    game, and changes to an ended game's scores update its contribution.
+    """
+    player = models.OneToOneField(
+        Player, on_delete=models.CASCADE, primary_key=True
+    )
+    games_played = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    total_points = models.IntegerField(default=0)
+    best_score = models.IntegerField(default=0)
+    road_points = models.IntegerField(default=0)
+    city_points = models.IntegerField(default=0)
+    monastery_points = models.IntegerField(default=0)
+    field_points = models.IntegerField(default=0)
+
+    objects = PlayerStatsManager()
+
+    def average_score(self):
+        if self.games_played == 0:
+            return 0
+        return self.total_points / self.games_played
+
+class GameEvent(models.Model):
+    """
+    One entry in a game's append-only log of changes. The kinds are
+    player, turn, score, undo, edit and ended; data holds the details as JSON.
+    """
+    game = models.ForeignKey(Game, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10)
+    data = models.TextField(default='{}')
+    created = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def for_game(cls, game, kind, **data):
+        return cls(game_id=game.pk, kind=kind, data=json.dumps(data))
+
+    def apply(self, state):
+        """
+        Update a replayed state dict (see GameSnapshot.empty_state)
+        """
+        data = json.loads(self.data)
+        if self.kind == 'player':
+            state['players'].append(data['player'])
+            state['standings'][str(data['player'])] = dict.fromkeys(
+                GamePlayer.STANDING_FIELDS, 0
+            )
+        elif self.kind == 'turn':
+            state['turn_number'] = data['number']
+        elif self.kind in ('score', 'undo'):
+            self.apply_score(state, data, -1 if self.kind == 'undo' else 1)
+        elif self.kind == 'edit':
+            self.apply_score(state, data['old'], -1)
+            self.apply_score(state, data['new'], 1)
+        elif self.kind == 'ended':
+            state['ended'] = True
+
+    @staticmethod
+    def apply_score(state, data, sign):
+        standing = state['standings'].get(str(data['player']))
+        if standing is None:
+            return
+        phase_field = 'final_points' if data['final'] else 'turn_points'
+        event_field = '%s_points' % data['event']
+        for field in (phase_field, event_field):
+            if field in standing:
+                standing[field] += sign * data['points']
+
+class GameSnapshot(models.Model):
+    """
+    A game's replayed state as of one of its events
+    """
+    # replaying at least this many events saves a new snapshot
+    INTERVAL = 50
+
+    game = models.ForeignKey(Game, on_delete=models.CASCADE)
+    last_event_id = models.IntegerField(default=0)
+    state = models.TextField()
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['game', '-last_event_id'], name='snapshot_latest_idx'
+            ),
+        ]
+
+    @staticmethod
+    def empty_state():
+        return {
+            'players': [],
+            'turn_number': -1,
+            'ended': False,
+            'standings': {},
+        }
+
+    def load(self):
+        return json.loads(self.state)
@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+# Sent by Game after each change to a game's state, once the change has
+# been written. Receivers get the game and a kind: 'player', 'turn',
+# 'turn_score', 'final_score', 'undo', 'edit' or 'ended'. Score changes also
+# pass the score.
+game_changed = Signal()
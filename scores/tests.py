@@ -1,8 +1,37 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 
-from .models import Player, Score, Game, Turn, GamePlayer
-from .views import StartGameForm
+from . import cache as scores_cache, leaderboard, live, metrics, transfer
+from .asgi import READ_ONLY_VIEWS, ScoresASGIHandler, route
+from .management.commands import benchmark_models
+from .models import (
+    Player, Score, Game, Turn, GamePlayer, PlayerStats, GameSnapshot,
+    Counter, score_points
+)
+from .views import IndexView, StartGameForm
 
 class PlayerModelTests(TestCase):
     def test_player_name(self):
@@ -116,6 +145,29 @@ class GameModelTests(TestCase):
         g.turn_set.create(number=12, player=p)
         self.assertEqual(g.turn_number(), 41)
 
+    def test_add_turn_stores_last_turn_number(self):
+        g = Game(name='test')
+        g.save()
+        p = Player(name='Winston')
+        p.save()
+        g.add_player(p.pk)
+        g.add_turn()
+        g.add_turn()
+        self.assertEqual(Game.objects.get(pk=g.pk).last_turn_number, 1)
+
+    def test_turn_number_query_count_is_independent_of_turns(self):
+        g = Game(name='test')
+        g.save()
+        p = Player(name='Winston')
+        p.save()
+        g.add_player(p.pk)
+        for i in range(50):
+            g.add_turn()
+        g = Game.objects.get(pk=g.pk)
+        with self.assertNumQueries(2):
+            self.assertEqual(g.turn_number(), 49)
+            self.assertEqual(g.current_turn().number, 49)
+
     def test_current_player_is_first_player_on_first_turn(self):
         g = Game(name='x')
         g.save()
@@ -211,6 +263,25 @@ class GameModelTests(TestCase):
         s = t.scores.get(player_id=p1.pk)
         self.assertEqual(s.points, 10)
 
+    def test_turn_score_points_at_game_and_turn(self):
+        g = Game(name='x')
+        g.save()
+        p1 = Player(name='Jean')
+        p1.save()
+        g.add_player(p1.pk)
+        t = g.add_turn()
+        s = g.score_completed_road(p1.pk, 4)
+        self.assertEqual((s.game_id, s.turn_id, s.is_final), (g.pk, t.pk, False))
+
+    def test_final_score_points_at_game_only(self):
+        g = Game(name='x')
+        g.save()
+        p1 = Player(name='Jean')
+        p1.save()
+        g.add_player(p1.pk)
+        s = g.score_field(p1.pk, 2)
+        self.assertEqual((s.game_id, s.turn_id, s.is_final), (g.pk, None, True))
+
     def test_score_incomplete_monastery_creates_score(self):
         g = Game(name='x')
         g.save()
@@ -326,6 +397,353 @@ class GameModelTests(TestCase):
         self.assertTrue(g.is_ended())
 
 
+class TotalScoresQueryTests(TestCase):
+    def play_game(self, player_count, turn_count):
+        g = Game(name='long game')
+        g.save()
+        for i in range(player_count):
+            p = Player(name='Player %d' % i)
+            p.save()
+            g.add_player(p.pk)
+        players = g.player_order()
+        for i in range(turn_count):
+            g.add_turn()
+            g.score_completed_road(players[i % player_count].pk, 3)
+        g.score_field(players[0].pk, 2)
+        return g
+
+    def test_total_scores_query_count_is_independent_of_turns(self):
+        g = self.play_game(2, 3)
+        with self.assertNumQueries(1):
+            g.total_scores()
+        g = self.play_game(2, 30)
+        with self.assertNumQueries(1):
+            g.total_scores()
+
+    def test_total_scores_query_count_is_independent_of_players(self):
+        g = self.play_game(2, 10)
+        with self.assertNumQueries(1):
+            g.total_scores()
+        g = self.play_game(5, 10)
+        with self.assertNumQueries(1):
+            g.total_scores()
+
+    def test_total_scores_sums_turn_and_final_scores(self):
+        g = self.play_game(2, 5)
+        players = g.player_order()
+        expected = [[players[0], 15], [players[1], 6]]
+        self.assertEqual(g.total_scores(), expected)
+
+    def test_total_score_ignores_other_games(self):
+        g = self.play_game(2, 4)
+        other = self.play_game(2, 4)
+        p = g.player_order()[0]
+        self.assertEqual(g.total_score(p), 12)
+
+
+class StandingsTests(TestCase):
+    def setUp(self):
+        self.game = Game(name='standings')
+        self.game.save()
+        self.scott = Player(name='Scott')
+        self.scott.save()
+        self.game.add_player(self.scott.pk)
+        self.jean = Player(name='Jean')
+        self.jean.save()
+        self.game.add_player(self.jean.pk)
+        self.game.add_turn()
+        self.game.score_completed_city(self.scott.pk, 3, 1)
+        self.game.score_completed_road(self.jean.pk, 4)
+        self.game.add_turn()
+        self.game.score_completed_monastery(self.jean.pk)
+        self.game.score_field(self.scott.pk, 2)
+
+    def test_score_methods_update_standings(self):
+        gp = self.game.gameplayer_set.get(player=self.scott)
+        self.assertEqual(gp.turn_points, 8)
+        self.assertEqual(gp.final_points, 6)
+        self.assertEqual(gp.city_points, 8)
+        self.assertEqual(gp.field_points, 6)
+        self.assertEqual(gp.total_points(), 14)
+
+    def test_standings_match_tally(self):
+        tally = self.game.tally_standings()
+        for gp in self.game.gameplayer_set.all():
+            self.assertEqual(gp.standing(), tally[gp.player_id])
+
+    def test_check_reports_drift(self):
+        self.game.gameplayer_set.filter(player=self.jean).update(road_points=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_standings', '--check', stderr=StringIO())
+
+    def test_check_passes_without_drift(self):
+        out = StringIO()
+        call_command('rebuild_standings', '--check', stdout=out)
+        self.assertIn('0 game(s) drifted', out.getvalue())
+
+    def test_rebuild_repairs_drift(self):
+        self.game.gameplayer_set.update(turn_points=0, final_points=100)
+        call_command('rebuild_standings', stdout=StringIO(), stderr=StringIO())
+        expected = [[self.scott, 14], [self.jean, 13]]
+        self.assertEqual(self.game.total_scores(), expected)
+
+
+class GameMemoTests(TestCase):
+    def setUp(self):
+        self.game = Game(name='memo')
+        self.game.save()
+        for name in ['Scott', 'Jean', 'Charles']:
+            p = Player(name=name)
+            p.save()
+            self.game.add_player(p.pk)
+        self.game.add_turn()
+
+    def test_player_order_is_queried_once(self):
+        with self.assertNumQueries(1):
+            self.game.player_order()
+            self.game.player_order()
+            self.game.total_scores()
+
+    def test_score_write_invalidates_totals(self):
+        self.game.total_scores()
+        p = self.game.player_order()[0]
+        self.game.score_completed_road(p.pk, 3)
+        self.assertEqual(self.game.total_scores()[0], [p, 3])
+
+    def test_turn_state_is_queried_once(self):
+        with self.assertNumQueries(3):
+            self.game.current_player()
+            self.game.next_player()
+            self.game.turn_number()
+            self.game.current_turn()
+            self.game.current_turn()
+
+    def test_add_player_invalidates_player_order(self):
+        self.game.player_order()
+        p = Player(name='Logan')
+        p.save()
+        self.game.add_player(p.pk)
+        self.assertEqual(self.game.player_order()[-1], p)
+
+    def test_add_turn_invalidates_turn_state(self):
+        first = self.game.current_turn()
+        self.game.turn_number()
+        second = self.game.add_turn()
+        self.assertEqual(self.game.turn_number(), 1)
+        self.assertEqual(self.game.current_turn(), second)
+        self.assertNotEqual(first, second)
+
+    def test_refresh_from_db_invalidates(self):
+        self.game.turn_number()
+        Game.objects.get(pk=self.game.pk).add_turn()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.turn_number(), 1)
+
+
+class EventLogTests(TestCase):
+    def setUp(self):
+        self.scott = Player(name='Scott')
+        self.scott.save()
+        self.jean = Player(name='Jean')
+        self.jean.save()
+        self.game = Game.objects.create_with_players(
+            'log', [self.scott.pk, self.jean.pk]
+        )
+
+    def assertReplayMatchesStandings(self):
+        state = self.game.replay()
+        self.assertEqual(state['players'], [self.scott.pk, self.jean.pk])
+        self.assertEqual(state['turn_number'], self.game.turn_number())
+        self.assertEqual(state['ended'], self.game.is_ended())
+        for gp in self.game.gameplayer_set.all():
+            self.assertEqual(
+                state['standings'][str(gp.player_id)], gp.standing()
+            )
+
+    def test_every_mutation_is_logged(self):
+        self.game.score_completed_road(self.scott.pk, 3)
+        self.game.add_turn()
+        self.game.end_game()
+        self.game.score_field(self.jean.pk, 2)
+        kinds = list(self.game.gameevent_set.order_by('pk').values_list(
+            'kind', flat=True
+        ))
+        self.assertEqual(
+            kinds,
+            ['player', 'player', 'turn', 'score', 'turn', 'ended', 'score']
+        )
+
+    def test_replay_matches_running_totals(self):
+        self.game.score_completed_city(self.scott.pk, 3, 1)
+        self.game.add_turn()
+        self.game.score_completed_monastery(self.jean.pk)
+        self.game.add_scores([], [
+            Score(event='field', player_id=self.jean.pk, points=6),
+        ])
+        self.game.end_game()
+        self.assertReplayMatchesStandings()
+
+    def test_long_replay_saves_snapshot(self):
+        for i in range(GameSnapshot.INTERVAL):
+            self.game.add_turn()
+        self.game.replay()
+        self.assertEqual(self.game.gamesnapshot_set.count(), 1)
+        self.game.score_completed_road(self.jean.pk, 2)
+        with self.assertNumQueries(2):
+            state = self.game.replay()
+        self.assertEqual(state['standings'][str(self.jean.pk)]['road_points'], 2)
+        self.assertEqual(state['turn_number'], GameSnapshot.INTERVAL)
+
+    def test_undo_last_score_removes_it(self):
+        self.game.score_completed_road(self.scott.pk, 3)
+        last = self.game.score_completed_road(self.jean.pk, 5)
+        removed = self.game.undo_last_score()
+        self.assertEqual((removed.player_id, removed.points), (self.jean.pk, 5))
+        self.assertFalse(Score.objects.filter(pk=last.pk).exists())
+        self.assertEqual(
+            self.game.total_scores(), [[self.scott, 3], [self.jean, 0]]
+        )
+        self.assertReplayMatchesStandings()
+
+    def test_undo_after_ending_refreshes_stats(self):
+        self.game.score_completed_road(self.scott.pk, 3)
+        self.game.end_game()
+        self.game.score_field(self.jean.pk, 2)
+        self.game.undo_last_score()
+        self.assertEqual(PlayerStats.objects.get(player=self.scott).wins, 1)
+        self.assertEqual(PlayerStats.objects.get(player=self.jean).wins, 0)
+
+    def test_undo_with_no_scores_returns_none(self):
+        self.assertIsNone(self.game.undo_last_score())
+
+    def test_undo_query_count_is_independent_of_game_length(self):
+        for i in range(30):
+            self.game.add_turn()
+            self.game.score_completed_road(self.scott.pk, 1)
+        game = Game.objects.get(pk=self.game.pk)
+        with self.assertNumQueries(7):
+            game.undo_last_score()
+
+
+class ScoreCorrectionTests(TestCase):
+    def setUp(self):
+        self.scott = Player(name='Scott')
+        self.scott.save()
+        self.jean = Player(name='Jean')
+        self.jean.save()
+        self.game = Game.objects.create_with_players(
+            'corrections', [self.scott.pk, self.jean.pk]
+        )
+
+    def assertStandingsMatchTally(self):
+        tally = self.game.tally_standings()
+        for gp in self.game.gameplayer_set.all():
+            expected = tally.get(gp.player_id, dict.fromkeys(gp.standing(), 0))
+            self.assertEqual(gp.standing(), expected)
+        recounted = {
+            p.pk: sum(s.points for s in self.game.score_set.filter(player=p))
+            for p in (self.scott, self.jean)
+        }
+        self.assertEqual(
+            self.game.total_scores(),
+            [[self.scott, recounted[self.scott.pk]],
+             [self.jean, recounted[self.jean.pk]]]
+        )
+
+    def test_edit_score_moves_points(self):
+        score = self.game.score_completed_road(self.scott.pk, 3)
+        self.game.edit_score(score.pk, self.jean.pk, 'city', 8)
+        score.refresh_from_db()
+        self.assertEqual(
+            (score.player_id, score.event, score.points), (self.jean.pk, 'city', 8)
+        )
+        self.assertEqual(
+            self.game.total_scores(), [[self.scott, 0], [self.jean, 8]]
+        )
+        jean = self.game.gameplayer_set.get(player=self.jean)
+        self.assertEqual((jean.road_points, jean.city_points), (0, 8))
+
+    def test_edit_is_logged_and_replayed(self):
+        score = self.game.score_completed_road(self.scott.pk, 3)
+        self.game.edit_score(score.pk, self.scott.pk, 'road', 5)
+        self.assertEqual(
+            self.game.gameevent_set.order_by('-pk').first().kind, 'edit'
+        )
+        state = self.game.replay()
+        self.assertEqual(
+            state['standings'][str(self.scott.pk)]['road_points'], 5
+        )
+
+    def test_edit_after_ending_refreshes_stats(self):
+        score = self.game.score_completed_road(self.scott.pk, 3)
+        self.game.end_game()
+        self.game.edit_score(score.pk, self.jean.pk, 'road', 3)
+        self.assertEqual(PlayerStats.objects.get(player=self.scott).wins, 0)
+        self.assertEqual(PlayerStats.objects.get(player=self.jean).wins, 1)
+
+    def test_random_corrections_match_recount(self):
+        rng = random.Random(15)
+        players = [self.scott.pk, self.jean.pk]
+        for step in range(60):
+            action = rng.choice(['turn', 'score', 'score', 'undo', 'edit'])
+            if action == 'turn' and not self.game.ended:
+                self.game.add_turn()
+            elif action == 'score':
+                if self.game.ended or rng.random() < 0.2:
+                    if not self.game.ended:
+                        self.game.end_game()
+                    self.game.score_field(rng.choice(players), rng.randint(0, 3))
+                else:
+                    self.game.score_completed_road(
+                        rng.choice(players), rng.randint(1, 6)
+                    )
+            elif action == 'undo':
+                self.game.undo_last_score()
+            elif action == 'edit':
+                score = self.game.score_set.order_by('?').first()
+                if score is not None:
+                    self.game.edit_score(
+                        score.pk, rng.choice(players), score.event,
+                        rng.randint(0, 12)
+                    )
+            self.assertStandingsMatchTally()
+
+
+class GameVersionTests(TestCase):
+    def setUp(self):
+        self.scott = Player(name='Scott')
+        self.scott.save()
+        self.game = Game.objects.create_with_players('versions', [self.scott.pk])
+
+    def stored_version(self):
+        return Game.objects.get(pk=self.game.pk).version
+
+    def test_every_change_bumps_the_version(self):
+        versions = [self.stored_version()]
+        self.game.add_turn()
+        versions.append(self.stored_version())
+        score = self.game.score_completed_road(self.scott.pk, 3)
+        versions.append(self.stored_version())
+        self.game.edit_score(score.pk, self.scott.pk, 'road', 4)
+        versions.append(self.stored_version())
+        self.game.end_game()
+        versions.append(self.stored_version())
+        self.game.add_scores([], [
+            Score(event='field', player_id=self.scott.pk, points=3),
+            Score(event='road', player_id=self.scott.pk, points=1),
+        ])
+        versions.append(self.stored_version())
+        self.game.undo_last_score()
+        versions.append(self.stored_version())
+        self.assertEqual(versions, list(range(1, 8)))
+        self.assertEqual(self.game.version, 7)
+
+    def test_saving_a_loaded_game_keeps_its_version(self):
+        self.game.add_turn()
+        self.game.name = 'renamed'
+        self.game.save()
+        self.assertEqual(self.stored_version(), 2)
+
 class TurnModelTests(TestCase):
 
     def test_turn_number(self):
@@ -362,8 +780,77 @@ class IndexViewTests(TestCase):
         g.save()
         response = self.client.get(reverse('scores:index'))
         self.assertContains(response, 'Family Night')
+    def make_games(self, count):
+        player = Player(name='Wil')
+        player.save()
+        games = []
+        for i in range(count):
+            games.append(
+                Game.objects.create_with_players('Night %d' % i, [player.pk])
+            )
+        return games
+
+    def test_index_shows_newest_page_first(self):
+        self.make_games(IndexView.page_size + 5)
+        response = self.client.get(reverse('scores:index'))
+        games = response.context['game_list']
+        self.assertEqual(len(games), IndexView.page_size)
+        self.assertEqual(games[0].name, 'Night %d' % (IndexView.page_size + 4))
+        self.assertTrue(response.context['next_cursor'])
+
+    def test_index_cursor_continues_after_last_game(self):
+        self.make_games(IndexView.page_size + 5)
+        response = self.client.get(reverse('scores:index'))
+        response = self.client.get(
+            reverse('scores:index'),
+            {'before': response.context['next_cursor']}
+        )
+        names = [ g.name for g in response.context['game_list'] ]
+        self.assertEqual(names, ['Night %d' % i for i in range(4, -1, -1)])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_index_ignores_bad_cursor(self):
+        self.make_games(2)
+        response = self.client.get(reverse('scores:index'), {'before': 'x'})
+        self.assertEqual(len(response.context['game_list']), 2)
+
+    def test_index_filters_by_status(self):
+        games = self.make_games(3)
+        games[1].end_game()
+        response = self.client.get(reverse('scores:index'), {'status': 'ended'})
+        self.assertEqual(list(response.context['game_list']), [games[1]])
+        response = self.client.get(
+            reverse('scores:index'), {'status': 'in_progress'}
+        )
+        self.assertEqual(len(response.context['game_list']), 2)
+
+    def test_index_summarizes_games(self):
+        scott = Player(name='Scott')
+        scott.save()
+        jean = Player(name='Jean')
+        jean.save()
+        g = Game.objects.create_with_players('Summary', [scott.pk, jean.pk])
+        g.score_completed_road(jean.pk, 4)
+        g.add_turn()
+        game = Game.objects.with_summary().get(pk=g.pk)
+        self.assertEqual(game.player_count, 2)
+        self.assertEqual(game.turn_count, 2)
+        self.assertEqual(game.leader_name, 'Jean')
+        self.assertEqual(game.leader_points, 4)
+
+    def test_index_query_count_is_independent_of_games(self):
+        self.make_games(3)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('scores:index'))
+        self.make_games(30)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('scores:index'))
 
 class GameViewTests(TestCase):
+    def setUp(self):
+        # game ids are reused between tests, so cached fragments would be too
+        cache.clear()
+
     def test_game_detail_exists(self):
         g = Game(name='Family Night')
         g.save()
@@ -470,6 +957,172 @@ class GameViewTests(TestCase):
         expected = reverse('scores:add_turn_score', args=(g.pk,))
         self.assertContains(response, 'The game has ended')
 
+    def test_game_detail_is_not_modified_for_current_etag(self):
+        harold = Player(name='Harold')
+        harold.save()
+        g = Game.objects.create_with_players('Movie Night', [harold.pk])
+        url = reverse("scores:game", args=(g.pk,))
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        g.score_completed_road(harold.pk, 2)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_game_detail_query_count_is_fixed(self):
+        g = Game(name='test')
+        g.save()
+        for name in ['Arthur', 'Ford', 'Zaphod']:
+            p = Player(name=name)
+            p.save()
+            g.add_player(p.pk)
+        g.add_turn()
+        url = reverse("scores:game", args=(g.pk,))
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        for i in range(20):
+            g.add_turn()
+            g.score_completed_road(g.current_player().pk, 2)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+class GameFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        scores_cache.reset()
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.maude = Player(name='Maude')
+        self.maude.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk, self.maude.pk]
+        )
+        self.url = reverse('scores:game', args=(self.game.pk,))
+
+    def test_unchanged_game_renders_from_fragments(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Harold, Maude')
+        self.assertContains(response, '<option value="%d">' % self.maude.pk)
+        stats = scores_cache.stats()['namespaces']
+        self.assertEqual(
+            stats['template.cache.game_scoreboard'], {'hits': 1, 'misses': 1}
+        )
+        self.assertEqual(
+            stats['template.cache.game_player_options'], {'hits': 1, 'misses': 1}
+        )
+
+    def test_scoreboard_follows_the_game_version(self):
+        self.client.get(self.url)
+        self.game.score_completed_road(self.maude.pk, 3)
+        response = self.client.get(self.url)
+        self.assertContains(response, '<span id="total-%d">3</span>' % (
+            self.maude.pk
+        ))
+
+    def test_scores_and_turns_keep_player_fragments(self):
+        self.client.get(self.url)
+        self.game.score_completed_road(self.maude.pk, 3)
+        self.game.add_turn()
+        self.client.get(self.url)
+        stats = scores_cache.stats()['namespaces']
+        self.assertEqual(
+            stats['template.cache.game_players'], {'hits': 1, 'misses': 1}
+        )
+        self.assertEqual(
+            stats['template.cache.game_player_options'], {'hits': 1, 'misses': 1}
+        )
+        self.assertEqual(
+            stats['template.cache.game_scoreboard'], {'hits': 0, 'misses': 2}
+        )
+
+    def test_new_seat_replaces_player_fragments(self):
+        self.client.get(self.url)
+        ruth = Player(name='Ruth')
+        ruth.save()
+        self.game.add_player(ruth.pk)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Harold, Maude, Ruth')
+        self.assertContains(response, '<option value="%d">' % ruth.pk)
+
+    def test_renamed_player_reaches_cached_fragments_and_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.harold.name = 'Hal'
+        self.harold.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Hal, Maude')
+        self.assertContains(response, '>Hal</option>', count=1)
+        self.assertContains(response, 'Hal: <span')
+        self.assertNotContains(response, 'Harold')
+
+    def test_cache_stats_are_for_staff(self):
+        url = reverse('scores:api_cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.create_user('admin', password='pw', is_staff=True)
+        self.client.login(username='admin', password='pw')
+        self.client.get(self.url)
+        data = self.client.get(url).json()
+        self.assertEqual(data['hits'], 0)
+        self.assertEqual(data['misses'], 3)
+
+@override_settings(
+    MIDDLEWARE=['scores.metrics.MetricsMiddleware'] + settings.MIDDLEWARE
+)
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk]
+        )
+
+    def test_middleware_records_each_view(self):
+        for i in range(3):
+            self.client.get(reverse('scores:game', args=(self.game.pk,)))
+        self.client.get(reverse('scores:api_scoreboard', args=(self.game.pk,)))
+        views = metrics.summary()
+        game = views['scores:game']
+        self.assertEqual(game['count'], 3)
+        self.assertEqual(game['queries']['p50'], 3)
+        self.assertGreater(game['template_ms']['max'], 0)
+        self.assertGreater(game['bytes']['p50'], 0)
+        self.assertEqual(views['scores:api_scoreboard']['template_ms']['max'], 0)
+
+    def test_percentiles_use_nearest_rank(self):
+        ordered = list(range(1, 101))
+        self.assertEqual(metrics.percentile(ordered, 50), 50)
+        self.assertEqual(metrics.percentile(ordered, 99), 99)
+        self.assertEqual(metrics.percentile([7], 90), 7)
+
+    def test_metrics_are_for_staff(self):
+        url = reverse('scores:api_metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.create_user('admin', password='pw', is_staff=True)
+        self.client.login(username='admin', password='pw')
+        self.client.get(reverse('scores:index'))
+        self.assertIn('scores:index', self.client.get(url).json()['views'])
+
+    def test_profile_views_enforces_query_budget(self):
+        out = StringIO()
+        call_command(
+            'profile_views', requests=2, host='testserver', stdout=out
+        )
+        self.assertIn('scores:game', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command(
+                'profile_views', requests=1, host='testserver', max_queries=1,
+                stdout=StringIO()
+            )
+
 class PlayerListViewTests(TestCase):
     def test_player_list_exists(self):
         response = self.client.get(reverse("scores:player_list"))
@@ -481,6 +1134,44 @@ class PlayerListViewTests(TestCase):
         response = self.client.get(reverse('scores:player_list'))
         self.assertContains(response, 'Jupiter')
 
+    def test_player_list_is_paginated(self):
+        for i in range(60):
+            Player(name='Player %02d' % i).save()
+        response = self.client.get(reverse('scores:player_list'))
+        self.assertEqual(len(response.context['player_list']), 50)
+        response = self.client.get(reverse('scores:player_list'), {'page': 2})
+        self.assertEqual(len(response.context['player_list']), 10)
+
+    def test_player_list_searches_by_prefix(self):
+        for name in ['Jupiter', 'juno', 'Mars']:
+            Player(name=name).save()
+        response = self.client.get(reverse('scores:player_list'), {'q': 'JU'})
+        names = [ p.name for p in response.context['player_list'] ]
+        self.assertEqual(names, ['juno', 'Jupiter'])
+
+class PlayerSearchTests(TestCase):
+    def test_name_prefix_ignores_case(self):
+        for name in ['Becca', 'ben', 'Felicia']:
+            Player(name=name).save()
+        names = [ p.name for p in Player.objects.name_prefix('BE') ]
+        self.assertEqual(names, ['Becca', 'ben'])
+
+    def test_save_keeps_search_name_current(self):
+        p = Player(name='Wil')
+        p.save()
+        p.name = 'Wheaton'
+        p.save()
+        self.assertEqual(Player.objects.get(pk=p.pk).search_name, 'wheaton')
+
+    def test_search_endpoint_returns_limited_matches(self):
+        for i in range(15):
+            Player(name='Sam %02d' % i).save()
+        Player(name='Frodo').save()
+        response = self.client.get(reverse('scores:player_search'), {'q': 'sa'})
+        players = response.json()['players']
+        self.assertEqual(len(players), 10)
+        self.assertEqual(players[0]['name'], 'Sam 00')
+
 class PlayerViewTests(TestCase):
     def test_player_view_exists(self):
         p = Player(name='Seth')
@@ -488,11 +1179,243 @@ class PlayerViewTests(TestCase):
         response = self.client.get(reverse("scores:player", args=(p.id,)))
         self.assertEqual(response.status_code, 200)
 
+    def test_player_view_shows_career_stats(self):
+        p = Player(name='Seth')
+        p.save()
+        other = Player(name='Rob')
+        other.save()
+        g = Game.objects.create_with_players('x', [p.pk, other.pk])
+        g.score_completed_city(p.pk, 3, 0)
+        g.end_game()
+        response = self.client.get(reverse("scores:player", args=(p.id,)))
+        self.assertContains(response, 'Wins: 1')
+        self.assertContains(response, 'Cities: 6')
+
+    def test_player_view_query_count_is_independent_of_history(self):
+        p = Player(name='Seth')
+        p.save()
+        url = reverse("scores:player", args=(p.id,))
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        for i in range(5):
+            g = Game.objects.create_with_players('x', [p.pk])
+            g.score_completed_road(p.pk, 3)
+            g.end_game()
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+class PlayerStatsTests(TestCase):
+    def setUp(self):
+        self.scott = Player(name='Scott')
+        self.scott.save()
+        self.jean = Player(name='Jean')
+        self.jean.save()
+
+    def play(self, scott_road, jean_road):
+        g = Game.objects.create_with_players('x', [self.scott.pk, self.jean.pk])
+        g.score_completed_road(self.scott.pk, scott_road)
+        g.score_completed_road(self.jean.pk, jean_road)
+        g.end_game()
+        return g
+
+    def test_stats_are_empty_before_games_end(self):
+        g = Game.objects.create_with_players('x', [self.scott.pk, self.jean.pk])
+        g.score_completed_road(self.scott.pk, 3)
+        self.assertFalse(PlayerStats.objects.filter(player=self.scott).exists())
+
+    def test_end_game_refreshes_stats(self):
+        self.play(5, 2)
+        self.play(1, 4)
+        self.play(3, 3)
+        stats = PlayerStats.objects.get(player=self.scott)
+        self.assertEqual(stats.games_played, 3)
+        self.assertEqual(stats.wins, 2)
+        self.assertEqual(stats.total_points, 9)
+        self.assertEqual(stats.best_score, 5)
+        self.assertEqual(stats.average_score(), 3)
+        self.assertEqual(stats.road_points, 9)
+
+    def test_final_score_after_end_updates_stats(self):
+        g = self.play(5, 2)
+        g.score_field(self.jean.pk, 2)
+        jean = PlayerStats.objects.get(player=self.jean)
+        scott = PlayerStats.objects.get(player=self.scott)
+        self.assertEqual(jean.total_points, 8)
+        self.assertEqual(jean.field_points, 6)
+        self.assertEqual(jean.wins, 1)
+        self.assertEqual(scott.wins, 0)
+
+    def stats(self):
+        return [
+            (s.player_id, s.games_played, s.wins, s.total_points,
+             s.best_score, s.road_points, s.field_points)
+            for s in PlayerStats.objects.order_by('player_id')
+        ]
+
+    def test_changes_after_end_match_a_full_refresh(self):
+        self.play(9, 2)
+        g = self.play(6, 4)
+        g.score_field(self.jean.pk, 1)
+        g.undo_last_score()
+        road = g.score_set.get(player=self.scott)
+        g.edit_score(road.pk, self.scott.pk, 'road', 1)
+        g.score_field(self.jean.pk, 2)
+        updated = self.stats()
+        PlayerStats.objects.refresh([self.scott.pk, self.jean.pk])
+        self.assertEqual(updated, self.stats())
+        scott = PlayerStats.objects.get(player=self.scott)
+        self.assertEqual((scott.wins, scott.best_score), (1, 9))
+
+    def test_lower_total_recomputes_best_score(self):
+        g = self.play(8, 2)
+        self.play(3, 1)
+        road = g.score_set.get(player=self.scott)
+        g.edit_score(road.pk, self.scott.pk, 'road', 1)
+        scott = PlayerStats.objects.get(player=self.scott)
+        self.assertEqual(scott.best_score, 3)
+        self.assertEqual(scott.wins, 1)
+
+    def test_final_score_after_end_does_not_rescan_careers(self):
+        g = self.play(5, 2)
+        with CaptureQueriesContext(connection) as first:
+            g.score_field(self.jean.pk, 1)
+        for i in range(10):
+            self.play(i, 3)
+        g = self.play(5, 2)
+        with CaptureQueriesContext(connection) as later:
+            g.score_field(self.jean.pk, 1)
+        self.assertEqual(len(later), len(first))
+        self.assertEqual(
+            PlayerStats.objects.get(player=self.jean).games_played, 12
+        )
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.scott = Player(name='Scott')
+        self.scott.save()
+        self.jean = Player(name='Jean')
+        self.jean.save()
+
+    def play(self, scott_road, jean_road, created=None):
+        g = Game.objects.create_with_players('x', [self.scott.pk, self.jean.pk])
+        if created is not None:
+            Game.objects.filter(pk=g.pk).update(created=created)
+        g.score_completed_road(self.scott.pk, scott_road)
+        g.score_completed_road(self.jean.pk, jean_road)
+        g.end_game()
+        return g
+
+    def test_rankings_by_wins_points_and_margin(self):
+        self.play(10, 2)
+        self.play(1, 4)
+        self.play(1, 5)
+        by_wins = leaderboard.rankings(order='wins')
+        self.assertEqual(by_wins[0]['name'], 'Jean')
+        self.assertEqual(by_wins[0]['wins'], 2)
+        by_points = leaderboard.rankings(order='points')
+        self.assertEqual(by_points[0]['name'], 'Scott')
+        self.assertEqual(by_points[0]['points'], 12)
+        by_margin = leaderboard.rankings(order='margin')
+        self.assertEqual(by_margin[0]['name'], 'Scott')
+        self.assertAlmostEqual(by_margin[0]['average_margin'], 1 / 3)
+
+    def test_rankings_ignore_unfinished_games(self):
+        g = Game.objects.create_with_players('x', [self.scott.pk, self.jean.pk])
+        g.score_completed_road(self.scott.pk, 3)
+        self.assertEqual(leaderboard.rankings(), [])
+
+    def test_rankings_filter_by_date_window(self):
+        self.play(10, 2, created=timezone.make_aware(datetime(2020, 1, 5, 23)))
+        self.play(1, 4, created=timezone.make_aware(datetime(2020, 2, 1)))
+        rows = leaderboard.rankings(since=date(2020, 1, 1), until=date(2020, 1, 5))
+        self.assertEqual([ r['games'] for r in rows ], [1, 1])
+        self.assertEqual(rows[0]['name'], 'Scott')
+
+    def test_rankings_are_cached(self):
+        self.play(10, 2)
+        leaderboard.rankings()
+        # only the generation is read
+        with self.assertNumQueries(1):
+            leaderboard.rankings(order='points')
+
+    def test_change_from_another_process_invalidates_cache(self):
+        g = self.play(3, 2)
+        leaderboard.rankings()
+        # what another worker's final score leaves behind in the database,
+        # with nothing happening in this process
+        GamePlayer.objects.filter(game=g, player=self.jean).update(
+            final_points=6
+        )
+        Counter.objects.bump(Counter.LEADERBOARD)
+        self.assertEqual(leaderboard.rankings()[0]['name'], 'Jean')
+
+    def test_rename_invalidates_cache(self):
+        self.play(10, 2)
+        leaderboard.rankings()
+        self.scott.name = 'Scotty'
+        self.scott.save()
+        self.assertEqual(leaderboard.rankings()[0]['name'], 'Scotty')
+
+    def test_import_invalidates_cache(self):
+        self.play(10, 2)
+        leaderboard.rankings()
+        transfer.GameImporter().run([transfer.clean_game(0, {
+            'name': 'imported',
+            'ended': True,
+            'players': ['Jean', 'Scott'],
+            'turns': 1,
+            'scores': [
+                {'turn': 0, 'player': 'Jean', 'event': 'road', 'points': 5},
+            ],
+        })])
+        self.assertEqual(leaderboard.rankings()[0]['games'], 2)
+
+    def test_unfinished_games_leave_the_counter_alone(self):
+        g = Game.objects.create_with_players('x', [self.scott.pk, self.jean.pk])
+        g.score_completed_road(self.scott.pk, 3)
+        g.add_turn()
+        self.assertEqual(Counter.objects.read(Counter.LEADERBOARD), 0)
+
+    def test_end_game_invalidates_cache(self):
+        self.play(10, 2)
+        leaderboard.rankings()
+        self.play(10, 2)
+        self.assertEqual(leaderboard.rankings()[0]['games'], 2)
+
+    def test_final_score_invalidates_cache(self):
+        g = self.play(3, 2)
+        leaderboard.rankings()
+        g.score_field(self.jean.pk, 1)
+        self.assertEqual(leaderboard.rankings()[0]['name'], 'Jean')
+
+    def test_edit_invalidates_cache(self):
+        g = self.play(3, 2)
+        leaderboard.rankings()
+        road = g.score_set.get(player=self.jean)
+        g.edit_score(road.pk, self.jean.pk, 'road', 4)
+        self.assertEqual(leaderboard.rankings()[0]['name'], 'Jean')
+
+    def test_leaderboard_page(self):
+        self.play(10, 2)
+        response = self.client.get(
+            reverse('scores:leaderboard'), {'order': 'points', 'since': 'bad'}
+        )
+        self.assertContains(response, 'Scott')
+        self.assertEqual(response.context['order'], 'points')
+        self.assertIsNone(response.context['since'])
+
 class NewGameViewTests(TestCase):
     def test_new_game_view_exists(self):
         response = self.client.get(reverse('scores:start_game'))
         self.assertEqual(response.status_code, 200)
 
+    def test_new_game_view_does_not_list_players(self):
+        Player(name='Somebody').save()
+        response = self.client.get(reverse('scores:start_game'))
+        self.assertNotContains(response, 'Somebody')
+        self.assertContains(response, reverse('scores:player_search'))
+
 class StartGameFormTests(TestCase):
     def test_start_two_player_game(self):
         harold = Player(name='Harold')
@@ -506,6 +1429,12 @@ class StartGameFormTests(TestCase):
         })
         self.assertTrue(form.is_valid())
 
+    def test_rebound_form_shows_chosen_player_name(self):
+        harold = Player(name='Harold')
+        harold.save()
+        form = StartGameForm({'name': 'Movie Night', 'player0': harold.pk})
+        self.assertIn('value="Harold"', form.as_p())
+
 
 class CreateGameTests(TestCase):
     def test_create_two_player_game_redirects(self):
@@ -583,6 +1512,681 @@ class CreateGameTests(TestCase):
         )
         game = Game.objects.get(name='Comedy Night')
         self.assertEqual(game.turn_number(), 0)
+    def test_create_game_with_unknown_player_is_rejected(self):
+        stan = Player(name='Stan')
+        stan.save()
+        response = self.client.post(
+            reverse('scores:create_game'),
+            data={
+                'name': 'Comedy Night',
+                'player0': str(stan.pk),
+                'player1': str(stan.pk + 100),
+                'player2': '',
+                'player3': '',
+                'player4': '',
+            }
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Game.objects.filter(name='Comedy Night').exists())
+
+    def test_create_game_with_duplicate_player_is_rejected(self):
+        stan = Player(name='Stan')
+        stan.save()
+        response = self.client.post(
+            reverse('scores:create_game'),
+            data={
+                'name': 'Comedy Night',
+                'player0': str(stan.pk),
+                'player1': str(stan.pk),
+                'player2': '',
+                'player3': '',
+                'player4': '',
+            }
+        )
+        self.assertContains(response, 'only take one seat', status_code=400)
+
+    def test_non_numeric_player_is_a_bad_request(self):
+        stan = Player(name='Stan')
+        stan.save()
+        response = self.client.post(
+            reverse('scores:create_game'),
+            data={'name': 'Comedy Night', 'player0': str(stan.pk),
+                  'player1': 'abc'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(response, 'Stan', status_code=400)
+
+class CreateWithPlayersTests(TestCase):
+    def setUp(self):
+        self.players = []
+        for name in ['John', 'Paul', 'George', 'Ringo', 'Pete']:
+            p = Player(name=name)
+            p.save()
+            self.players.append(p)
+
+    def test_seats_players_in_order(self):
+        ids = [ p.pk for p in reversed(self.players) ]
+        game = Game.objects.create_with_players('Beat Night', ids)
+        self.assertEqual(game.player_order(), list(reversed(self.players)))
+
+    def test_starts_on_turn_zero_with_first_player(self):
+        ids = [ p.pk for p in self.players ]
+        game = Game.objects.create_with_players('Beat Night', ids)
+        self.assertEqual(game.turn_number(), 0)
+        self.assertEqual(game.current_turn().player, self.players[0])
+        self.assertEqual(game.add_turn().player, self.players[1])
+
+    def test_query_count_is_independent_of_players(self):
+        ids = [ p.pk for p in self.players ]
+        with self.assertNumQueries(7):
+            Game.objects.create_with_players('Duo', ids[:2])
+        with self.assertNumQueries(7):
+            Game.objects.create_with_players('Quintet', ids)
+
+    def test_rejects_empty_player_list(self):
+        with self.assertRaises(ValueError):
+            Game.objects.create_with_players('Nobody', [])
+
+class ApiCreateGameTests(TestCase):
+    def post(self, data):
+        return self.client.post(
+            reverse('scores:api_create_game'),
+            data=json.dumps(data),
+            content_type='application/json'
+        )
+
+    def test_create_game_returns_game(self):
+        stan = Player(name='Stan')
+        stan.save()
+        oliver = Player(name='Oliver')
+        oliver.save()
+        response = self.post({
+            'name': 'Comedy Night',
+            'players': [stan.pk, oliver.pk],
+        })
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        game = Game.objects.get(name='Comedy Night')
+        self.assertEqual(data['id'], game.pk)
+        self.assertEqual(data['turn_number'], 0)
+        self.assertEqual(
+            [ p['name'] for p in data['players'] ], ['Stan', 'Oliver']
+        )
+
+    def test_create_game_rejects_unknown_player(self):
+        response = self.post({'name': 'Comedy Night', 'players': [999]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('999', response.json()['error'])
+
+    def test_create_game_rejects_bad_json(self):
+        response = self.client.post(
+            reverse('scores:api_create_game'),
+            data='not json',
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+class ApiGameTests(TestCase):
+    def setUp(self):
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.maude = Player(name='Maude')
+        self.maude.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk, self.maude.pk]
+        )
+
+    def post(self, name, data=None):
+        return self.client.post(
+            reverse(name, args=(self.game.pk,)),
+            data=json.dumps(data or {}),
+            content_type='application/json'
+        )
+
+    def test_scoreboard_returns_game_and_totals(self):
+        self.game.score_completed_road(self.maude.pk, 3)
+        response = self.client.get(
+            reverse('scores:api_scoreboard', args=(self.game.pk,))
+        )
+        data = response.json()
+        self.assertEqual(data['game']['name'], 'Movie Night')
+        self.assertEqual(
+            [ t['total'] for t in data['totals'] ], [0, 3]
+        )
+
+    def test_scoreboard_query_count_is_independent_of_game_size(self):
+        url = reverse('scores:api_scoreboard', args=(self.game.pk,))
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        for i in range(20):
+            self.game.add_turn()
+            self.game.score_completed_road(self.harold.pk, 2)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_scoreboard_is_not_modified_for_current_etag(self):
+        url = reverse('scores:api_scoreboard', args=(self.game.pk,))
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.post('scores:api_add_turn')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_timeline_accumulates_each_players_points_per_turn(self):
+        self.game.score_completed_road(self.maude.pk, 3)
+        self.game.add_turn()
+        self.game.add_turn()
+        self.game.score_completed_city(self.harold.pk, 2, 1)
+        self.game.end_game()
+        self.game.score_field(self.maude.pk, 2)
+        response = self.client.get(
+            reverse('scores:api_timeline', args=(self.game.pk,))
+        )
+        lines = response.json()['players']
+        self.assertEqual(
+            [ line['player']['name'] for line in lines ], ['Harold', 'Maude']
+        )
+        self.assertEqual(lines[0]['totals'], [0, 0, 6])
+        self.assertEqual(lines[1]['totals'], [3, 3, 3])
+        self.assertEqual([ line['final'] for line in lines ], [6, 9])
+        self.assertEqual(
+            [ line['final'] for line in lines ],
+            [ total for player, total in self.game.total_scores() ]
+        )
+
+    def test_timeline_query_count_is_independent_of_game_size(self):
+        players = [self.harold.pk, self.maude.pk]
+        for name in ['Ruth', 'Sunny', 'Violet']:
+            player = Player(name=name)
+            player.save()
+            players.append(player.pk)
+        game = Game.objects.create_with_players('Long Night', players)
+        for number in range(71):
+            game.score_completed_road(players[number % 5], 2)
+            game.add_turn()
+        url = reverse('scores:api_timeline', args=(game.pk,))
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        lines = response.json()['players']
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(len(lines[0]['totals']), 72)
+        self.assertEqual(lines[0]['final'], 2 * 15)
+
+    def test_scoreboard_of_missing_game_is_404(self):
+        response = self.client.get(reverse('scores:api_scoreboard', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_undo_removes_last_score(self):
+        self.game.score_completed_road(self.maude.pk, 3)
+        self.game.score_completed_road(self.harold.pk, 4)
+        response = self.post('scores:api_undo_score')
+        data = response.json()
+        self.assertEqual(data['removed']['player'], self.harold.pk)
+        self.assertEqual([ t['total'] for t in data['totals'] ], [0, 3])
+
+    def test_undo_without_scores_is_rejected(self):
+        response = self.post('scores:api_undo_score')
+        self.assertEqual(response.status_code, 400)
+
+    def test_edit_score_recomputes_points(self):
+        score = self.game.score_completed_road(self.maude.pk, 3)
+        response = self.client.post(
+            reverse('scores:api_edit_score', args=(self.game.pk, score.pk)),
+            data=json.dumps({
+                'player': self.harold.pk, 'event': 'city',
+                'tiles': 3, 'coats_of_arms': 1,
+            }),
+            content_type='application/json'
+        )
+        data = response.json()
+        self.assertEqual(data['score']['points'], 8)
+        self.assertEqual([ t['total'] for t in data['totals'] ], [8, 0])
+
+    def test_edit_score_rejects_event_for_phase(self):
+        score = self.game.score_completed_road(self.maude.pk, 3)
+        response = self.client.post(
+            reverse('scores:api_edit_score', args=(self.game.pk, score.pk)),
+            data=json.dumps({'event': 'field', 'cities': 2}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Score.objects.get(pk=score.pk).points, 3)
+
+    def test_edit_score_of_player_only_keeps_points(self):
+        score = self.game.score_completed_road(self.harold.pk, 5)
+        response = self.client.post(
+            reverse('scores:api_edit_score', args=(self.game.pk, score.pk)),
+            data=json.dumps({'player': self.maude.pk}),
+            content_type='application/json'
+        )
+        data = response.json()
+        self.assertEqual(data['score']['points'], 5)
+        self.assertEqual([ t['total'] for t in data['totals'] ], [0, 5])
+
+    def test_edit_score_event_without_counts_is_rejected(self):
+        score = self.game.score_completed_road(self.harold.pk, 5)
+        response = self.client.post(
+            reverse('scores:api_edit_score', args=(self.game.pk, score.pk)),
+            data=json.dumps({'event': 'city'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Score.objects.get(pk=score.pk).event, 'road')
+
+    def test_edit_score_of_another_game_is_404(self):
+        other = Game.objects.create_with_players('Other', [self.harold.pk])
+        score = other.score_completed_road(self.harold.pk, 3)
+        response = self.client.post(
+            reverse('scores:api_edit_score', args=(self.game.pk, score.pk)),
+            data=json.dumps({'tiles': 1}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_add_turn_returns_new_turn(self):
+        response = self.post('scores:api_add_turn')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.json()['turn'], {'number': 1, 'player': self.maude.pk}
+        )
+
+    def test_add_turn_score_returns_score_and_standing(self):
+        response = self.post('scores:api_add_turn_score', {
+            'event': 'city', 'player': self.maude.pk,
+            'tiles': 3, 'coats_of_arms': 1,
+        })
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['score']['points'], 8)
+        self.assertEqual(data['standing']['total'], 8)
+        self.assertEqual(data['standing']['city_points'], 8)
+
+    def test_add_turn_score_rejects_unknown_event(self):
+        response = self.post('scores:api_add_turn_score', {
+            'event': 'field', 'player': self.maude.pk, 'cities': 2,
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_add_turn_score_rejects_player_not_in_game(self):
+        response = self.post('scores:api_add_turn_score', {
+            'event': 'monastery', 'player': 999,
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_add_turn_score_rejects_bad_tiles(self):
+        response = self.post('scores:api_add_turn_score', {
+            'event': 'road', 'player': self.maude.pk, 'tiles': 'many',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_add_final_score_after_ending(self):
+        self.post('scores:api_end_game')
+        response = self.post('scores:api_add_final_score', {
+            'event': 'field', 'player': self.harold.pk, 'cities': 2,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['standing']['final_points'], 6)
+
+    def test_end_game_returns_totals(self):
+        response = self.post('scores:api_end_game')
+        self.assertTrue(response.json()['ended'])
+        self.assertTrue(Game.objects.get(pk=self.game.pk).is_ended())
+
+    def test_ended_game_rejects_turns(self):
+        self.post('scores:api_end_game')
+        response = self.post('scores:api_add_turn')
+        self.assertEqual(response.status_code, 400)
+
+    def test_ending_an_ended_game_is_rejected(self):
+        self.post('scores:api_end_game')
+        version = Game.objects.get(pk=self.game.pk).version
+        response = self.post('scores:api_end_game')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Game.objects.get(pk=self.game.pk).version, version)
+        ended = self.game.gameevent_set.filter(kind='ended')
+        self.assertEqual(ended.count(), 1)
+
+    def test_posts_need_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('scores:api_add_turn', args=(self.game.pk,))
+        self.assertEqual(client.post(url).status_code, 403)
+        token = client.get(reverse('scores:api_csrf')).json()['csrf_token']
+        response = client.post(url, HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+
+class ApiBatchScoreTests(TestCase):
+    def setUp(self):
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.maude = Player(name='Maude')
+        self.maude.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk, self.maude.pk]
+        )
+
+    def post(self, scores):
+        return self.client.post(
+            reverse('scores:api_add_scores', args=(self.game.pk,)),
+            data=json.dumps({'scores': scores}),
+            content_type='application/json'
+        )
+
+    def test_batch_records_turn_and_final_scores(self):
+        response = self.post([
+            {'phase': 'turn', 'event': 'road', 'player': self.harold.pk,
+             'tiles': 3},
+            {'phase': 'final', 'event': 'field', 'player': self.maude.pk,
+             'cities': 2},
+            {'phase': 'final', 'event': 'city', 'player': self.maude.pk,
+             'tiles': 2, 'coats_of_arms': 1},
+            {'phase': 'final', 'event': 'monastery', 'player': self.harold.pk,
+             'tiles': 5},
+        ])
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(len(data['scores']), 4)
+        self.assertEqual([ t['total'] for t in data['totals'] ], [8, 9])
+        self.assertEqual(
+            self.game.current_turn().scores.get().points, 3
+        )
+        self.assertEqual(self.game.final_scores.count(), 3)
+        self.assertEqual(
+            self.game.total_scores(), [[self.harold, 8], [self.maude, 9]]
+        )
+
+    def test_batch_matches_tally(self):
+        self.post([
+            {'phase': 'final', 'event': 'road', 'player': self.harold.pk,
+             'tiles': 2},
+            {'phase': 'final', 'event': 'road', 'player': self.harold.pk,
+             'tiles': 4},
+        ])
+        tally = self.game.tally_standings()
+        for gp in self.game.gameplayer_set.all():
+            self.assertEqual(
+                gp.standing(),
+                tally.get(gp.player_id, dict.fromkeys(gp.standing(), 0))
+            )
+
+    def test_batch_with_bad_entry_records_nothing(self):
+        response = self.post([
+            {'phase': 'final', 'event': 'road', 'player': self.harold.pk,
+             'tiles': 2},
+            {'phase': 'turn', 'event': 'field', 'player': self.harold.pk,
+             'cities': 2},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Score 1', response.json()['error'])
+        self.assertEqual(Score.objects.count(), 0)
+
+    def test_batch_after_ending_updates_stats(self):
+        self.game.end_game()
+        self.post([
+            {'phase': 'final', 'event': 'field', 'player': self.maude.pk,
+             'cities': 1},
+        ])
+        self.assertEqual(PlayerStats.objects.get(player=self.maude).wins, 1)
+        self.assertEqual(PlayerStats.objects.get(player=self.harold).wins, 0)
+
+class ImportGamesTests(TestCase):
+    def setUp(self):
+        self.harold = Player(name='Harold')
+        self.harold.save()
+
+    def import_file(self, content, suffix='.ndjson', **options):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, delete=False
+        ) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_games', f.name, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        output = self.import_file('\n'.join([
+            json.dumps({
+                'key': '1', 'name': 'Movie Night', 'ended': True,
+                'created': '2019-05-04T20:00:00+00:00',
+                'players': ['Harold', 'Maude'], 'turns': 3,
+                'scores': [
+                    {'turn': 0, 'player': 'Maude', 'event': 'road',
+                     'points': 3},
+                    {'turn': 2, 'player': 'Harold', 'event': 'city',
+                     'points': 8},
+                    {'turn': None, 'player': 'Harold', 'event': 'field',
+                     'points': 6},
+                ],
+            }),
+            '',
+            json.dumps({
+                'key': '2', 'name': 'Rematch', 'players': ['Maude', 'Ruth'],
+            }),
+        ]), chunk_size=1)
+        self.assertIn('Imported 2 game(s) and 3 score(s)', output)
+        game = Game.objects.get(name='Movie Night')
+        maude = Player.objects.get(name='Maude')
+        self.assertEqual(
+            game.total_scores(), [[self.harold, 14], [maude, 3]]
+        )
+        self.assertEqual(game.created.year, 2019)
+        self.assertEqual(game.turn_number(), 2)
+        self.assertEqual(game.current_player(), self.harold)
+        self.assertEqual(game.final_scores.count(), 1)
+        self.assertEqual(game.turn_set.get(number=2).scores.count(), 1)
+        tally = game.tally_standings()
+        for gp in game.gameplayer_set.all():
+            self.assertEqual(gp.standing(), tally[gp.player_id])
+        state = game.replay()
+        self.assertEqual(state['standings'][str(maude.pk)]['road_points'], 3)
+        self.assertEqual(PlayerStats.objects.get(player=self.harold).wins, 1)
+        rematch = Game.objects.get(name='Rematch')
+        self.assertEqual(rematch.turn_set.count(), 1)
+        self.assertEqual(Player.objects.filter(name='Maude').count(), 1)
+
+    def test_import_csv(self):
+        rows = [
+            ','.join(transfer.CSV_FIELDS),
+            '7,Movie Night,,true,Harold;Maude,2,0,Maude,city,8',
+            '7,Movie Night,,true,Harold;Maude,2,,Harold,road,2',
+            '8,Quiet Night,,false,Maude,1,,,,',
+        ]
+        self.import_file('\n'.join(rows) + '\n', suffix='.csv')
+        game = Game.objects.get(name='Movie Night')
+        self.assertEqual(
+            [ s for p, s in game.total_scores() ], [2, 8]
+        )
+        self.assertTrue(game.is_ended())
+        self.assertEqual(
+            Game.objects.get(name='Quiet Night').score_set.count(), 0
+        )
+
+    def test_bad_game_stops_import_after_earlier_chunks(self):
+        good = json.dumps({'name': 'Good', 'players': ['Harold']})
+        bad = json.dumps({
+            'name': 'Bad', 'players': ['Harold'],
+            'scores': [{'turn': 0, 'player': 'Harold', 'event': 'field',
+                        'points': 3}],
+        })
+        with self.assertRaisesMessage(CommandError, 'line 2'):
+            self.import_file(good + '\n' + bad + '\n', chunk_size=1)
+        self.assertEqual(
+            list(Game.objects.values_list('name', flat=True)), ['Good']
+        )
+
+    def test_malformed_games_are_reported_by_line(self):
+        for game, message in [
+            ({'scores': [1]}, 'expected a score object'),
+            ({'scores': 'abc'}, 'scores must be a list'),
+            ({'turns': 1000000000}, 'a game can have at most 10000 turns'),
+        ]:
+            game.update(name='Bad', players=['Harold'])
+            with self.assertRaisesMessage(CommandError, 'line 1: ' + message):
+                self.import_file(json.dumps(game) + '\n')
+        self.assertFalse(Game.objects.exists())
+
+    def test_max_turns_can_be_raised(self):
+        game = json.dumps({'name': 'Marathon', 'players': ['Harold'],
+                           'turns': 20})
+        with self.assertRaisesMessage(CommandError, 'at most 10 turns'):
+            self.import_file(game + '\n', max_turns=10)
+        self.import_file(game + '\n', max_turns=20)
+        self.assertEqual(Game.objects.get().last_turn_number, 19)
+
+class BenchmarkModelsTests(TestCase):
+    def run_benchmark(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command(
+                'benchmark_models', '--turns', '5', '50', '--players', '2',
+                '3', '--repeat', '1', '--no-time-budget', '--output', path,
+                *args, stdout=StringIO()
+            )
+            with open(path) as f:
+                return json.load(f)
+
+    def test_writes_a_result_for_each_method_and_size(self):
+        games = Game.objects.count()
+        results = self.run_benchmark()
+        self.assertEqual(len(results['results']), 7 * 2 * 2)
+        self.assertEqual(results['failures'], [])
+        self.assertEqual(
+            set(row['method'] for row in results['results']),
+            set(benchmark_models.BUDGETS)
+        )
+        # the seeded games are rolled back
+        self.assertEqual(Game.objects.count(), games)
+
+    def test_games_longer_than_the_import_limit(self):
+        results = self.run_benchmark(
+            '--turns', '10', str(transfer.MAX_TURNS + 1), '--players', '2'
+        )
+        self.assertEqual(
+            max(row['turns'] for row in results['results']),
+            transfer.MAX_TURNS + 1
+        )
+        self.assertEqual(results['failures'], [])
+
+    def test_query_counts_do_not_grow_with_turns(self):
+        counts = {}
+        for row in self.run_benchmark()['results']:
+            counts.setdefault(
+                (row['method'], row['players']), set()
+            ).add(row['queries'])
+        for key, queries in counts.items():
+            self.assertEqual(len(queries), 1, key)
+
+    def test_growth_over_budget_fails(self):
+        results = [
+            {'method': 'total_score', 'players': 2, 'turns': n,
+             'queries': n, 'ms': 0.5}
+            for n in [10, 100, 1000]
+        ]
+        failures = benchmark_models.over_budget(
+            results, benchmark_models.BUDGETS, 0.25
+        )
+        self.assertEqual(len(failures), 1)
+        self.assertIn('total_score with 2 players: queries', failures[0])
+        results = [
+            dict(row, queries=2, ms=row['turns'] / 100) for row in results
+        ]
+        self.assertEqual(len(benchmark_models.over_budget(
+            results, benchmark_models.BUDGETS, 0.25
+        )), 1)
+        self.assertEqual(benchmark_models.over_budget(
+            results, benchmark_models.BUDGETS, None
+        ), [])
+
+class ExportGamesTests(TestCase):
+    def setUp(self):
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.maude = Player(name='Maude')
+        self.maude.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk, self.maude.pk]
+        )
+        self.game.score_completed_road(self.maude.pk, 3)
+        self.game.add_turn()
+        self.game.end_game()
+        self.game.score_field(self.harold.pk, 2)
+        Game.objects.create_with_players('Rematch', [self.maude.pk])
+
+    def export(self, *args):
+        out = StringIO()
+        call_command('export_games', *args, stdout=out)
+        return out.getvalue()
+
+    def test_export_ndjson(self):
+        games = [ json.loads(line) for line in self.export().splitlines() ]
+        self.assertEqual([ g['name'] for g in games ], ['Movie Night', 'Rematch'])
+        self.assertEqual(games[0]['players'], ['Harold', 'Maude'])
+        self.assertEqual(games[0]['turns'], 2)
+        self.assertEqual(games[0]['scores'], [
+            {'turn': 0, 'player': 'Maude', 'event': 'road', 'points': 3},
+            {'turn': None, 'player': 'Harold', 'event': 'field', 'points': 6},
+        ])
+
+    def test_export_csv_round_trips(self):
+        exported = self.export('--format', 'csv')
+        self.assertEqual(len(exported.splitlines()), 4)
+        games = [
+            transfer.clean_game(n, g)
+            for n, g in transfer.read_csv(StringIO(exported))
+        ]
+        self.assertEqual(games[0]['scores'][1]['points'], 6)
+        self.assertEqual(games[1]['scores'], [])
+
+    def test_csv_keeps_names_with_the_old_separator(self):
+        self.maude.name = 'Maude; the Elder'
+        self.maude.save()
+        exported = self.export('--format', 'csv')
+        games = [ g for n, g in transfer.read_csv(StringIO(exported)) ]
+        self.assertEqual(games[0]['players'], ['Harold', 'Maude; the Elder'])
+        self.assertEqual(games[1]['players'], ['Maude; the Elder'])
+
+    def test_export_queries_are_per_chunk(self):
+        for i in range(5):
+            Game.objects.create_with_players('x', [self.harold.pk])
+        games = transfer.export_games(chunk_size=2)
+        with self.assertNumQueries(3 * 4):
+            self.assertEqual(len(list(games)), 7)
+
+    def test_export_endpoint_streams_for_staff(self):
+        url = reverse('scores:api_export_games')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.create_user('admin', password='pw', is_staff=True)
+        self.client.login(username='admin', password='pw')
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('game,name,created'))
+        self.assertEqual(
+            self.client.get(url, {'format': 'xml'}).status_code, 400
+        )
+
+class ScorePointsTests(TestCase):
+    def test_completed_features(self):
+        self.assertEqual(score_points('monastery', final=False), 9)
+        self.assertEqual(score_points('road', final=False, tiles=4), 4)
+        self.assertEqual(
+            score_points('city', final=False, tiles=4, coats_of_arms=1), 10
+        )
+
+    def test_incomplete_features(self):
+        self.assertEqual(score_points('monastery', final=True, tiles=6), 6)
+        self.assertEqual(
+            score_points('city', final=True, tiles=4, coats_of_arms=1), 5
+        )
+        self.assertEqual(score_points('field', final=True, cities=3), 9)
+
+    def test_fields_only_score_at_the_end(self):
+        with self.assertRaises(ValueError):
+            score_points('field', final=False, cities=3)
+
 
 class NextTurnTests(TestCase):
     def test_next_turn_adds_turn(self):
@@ -629,6 +2233,42 @@ class EndGameTests(TestCase):
         )
         self.assertTrue(Game.objects.get(pk=g.pk).is_ended())
 
+    def test_ending_twice_counts_the_game_once(self):
+        harold = Player(name='Harold')
+        harold.save()
+        g = Game.objects.create_with_players('Movie Night', [harold.pk])
+        g.score_completed_road(harold.pk, 4)
+        url = reverse('scores:end_game', args=[g.pk,])
+        self.client.post(url)
+        version = Game.objects.get(pk=g.pk).version
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('scores:game', args=[g.pk,]))
+        stats = PlayerStats.objects.get(player=harold)
+        self.assertEqual(
+            (stats.games_played, stats.wins, stats.total_points), (1, 1, 4)
+        )
+        self.assertEqual(Game.objects.get(pk=g.pk).version, version)
+        self.assertEqual(g.gameevent_set.filter(kind='ended').count(), 1)
+
+class UndoScoreTests(TestCase):
+    def test_undo_redirects_to_game_detail(self):
+        harold = Player(name='Harold')
+        harold.save()
+        g = Game.objects.create_with_players('Movie Night', [harold.pk])
+        g.score_completed_road(harold.pk, 3)
+        response = self.client.post(reverse('scores:undo_score', args=[g.pk,]))
+        self.assertRedirects(response, reverse('scores:game', args=[g.pk,]))
+        self.assertEqual(g.score_set.count(), 0)
+
+    def test_undo_needs_a_post(self):
+        harold = Player(name='Harold')
+        harold.save()
+        g = Game.objects.create_with_players('Movie Night', [harold.pk])
+        g.score_completed_road(harold.pk, 3)
+        response = self.client.get(reverse('scores:undo_score', args=[g.pk,]))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(g.score_set.count(), 1)
+
 class AddTurnScoreTests(TestCase):
     def test_add_monastery_score(self):
         harold = Player(name='Harold')
@@ -787,3 +2427,326 @@ class AddFinalScoreTests(TestCase):
         s = g.final_scores.get(player_id=maude.pk)
         self.assertEqual(s.points, 12)
 
+
+class LiveUpdateTests(TestCase):
+    def setUp(self):
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.maude = Player(name='Maude')
+        self.maude.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk, self.maude.pk]
+        )
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def subscribe(self):
+        async def subscribe():
+            return live.hub.subscribe(self.game.pk)
+        queue = self.loop.run_until_complete(subscribe())
+        self.addCleanup(live.hub.unsubscribe, self.game.pk, queue)
+        return queue
+
+    def drain(self, queue):
+        # run the callbacks the hub scheduled, then empty the queue
+        self.loop.run_until_complete(asyncio.sleep(0))
+        messages = []
+        while not queue.empty():
+            messages.append(queue.get_nowait())
+        return messages
+
+    def test_score_is_pushed_to_every_subscriber_once_computed(self):
+        first, second = self.subscribe(), self.subscribe()
+        self.game.score_completed_road(self.maude.pk, 3)
+        [message] = self.drain(first)
+        self.assertIs(self.drain(second)[0], message)
+        self.assertEqual(message['kind'], 'turn_score')
+        self.assertEqual(
+            [ (s['player'], s['total']) for s in message['standings'] ],
+            [(self.maude.pk, 3)]
+        )
+
+    def test_delta_extends_the_timeline_it_was_fetched_with(self):
+        # the game page applies deltas to the timeline instead of asking
+        # for it again, so they must agree
+        self.game.score_completed_road(self.harold.pk, 2)
+        queue = self.subscribe()
+        self.game.add_turn()
+        self.game.score_completed_city(self.maude.pk, 2, 0)
+        self.game.end_game()
+        self.game.score_field(self.harold.pk, 1)
+        timeline = {
+            line['player'].pk: line for line in self.game.score_timeline()
+        }
+        last = {}
+        for message in self.drain(queue):
+            for s in message['standings']:
+                last[s['player']] = s
+            self.assertEqual(
+                len(timeline[self.harold.pk]['totals']),
+                message['turn_number'] + 1
+            )
+        for pid, line in timeline.items():
+            self.assertEqual(line['totals'][-1], last[pid]['turn_points'])
+            self.assertEqual(line['final'], last[pid]['total'])
+
+    def test_turn_is_pushed_with_current_player(self):
+        queue = self.subscribe()
+        self.game.add_turn()
+        [message] = self.drain(queue)
+        self.assertEqual(message['turn_number'], 1)
+        self.assertEqual(message['current_player']['id'], self.maude.pk)
+
+    def test_nothing_is_computed_without_subscribers(self):
+        with self.assertNumQueries(8):
+            self.game.score_completed_road(self.maude.pk, 3)
+
+    def test_full_queue_drops_new_deltas(self):
+        queue = self.subscribe()
+        for i in range(live.QUEUE_SIZE + 5):
+            self.game.add_turn()
+        self.assertEqual(len(self.drain(queue)), live.QUEUE_SIZE)
+
+    def test_events_page_without_streaming_sends_scoreboard(self):
+        response = self.client.get(
+            reverse('scores:api_game_events', args=(self.game.pk,))
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('retry: %d\n' % live.RETRY))
+        self.assertIn('event: scoreboard', body)
+
+class LiveStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk]
+        )
+        self.application = ScoresASGIHandler()
+
+    def stream(self, game_id):
+        return ApplicationCommunicator(self.application, {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('scores:api_game_events', args=(game_id,)),
+            'headers': [],
+        })
+
+    def test_stream_sends_scoreboard_then_deltas(self):
+        async def watch():
+            stream = self.stream(self.game.pk)
+            await stream.send_input({'type': 'http.request'})
+            start = await stream.receive_output(5)
+            board = await stream.receive_output(5)
+            await sync_to_async(self.game.score_completed_road)(
+                self.harold.pk, 4
+            )
+            delta = await stream.receive_output(5)
+            await stream.send_input({'type': 'http.disconnect'})
+            await stream.wait(5)
+            return start, board, delta
+        start, board, delta = asyncio.run(watch())
+        self.assertEqual(start['status'], 200)
+        self.assertTrue(board['body'].startswith(b'event: scoreboard\n'))
+        self.assertTrue(delta['body'].startswith(b'event: delta\n'))
+        self.assertIn(b'"total": 4', delta['body'])
+        self.assertFalse(live.hub.has_subscribers(self.game.pk))
+
+    def test_stream_of_missing_game_is_404(self):
+        async def watch():
+            stream = self.stream(999)
+            await stream.send_input({'type': 'http.request'})
+            start = await stream.receive_output(5)
+            await stream.wait(5)
+            return start
+        self.assertEqual(asyncio.run(watch())['status'], 404)
+        self.assertFalse(live.hub.has_subscribers(999))
+
+class RecordingASGIHandler(ScoresASGIHandler):
+    def get_read_only_response(self, request):
+        self.reader_threads.append(threading.current_thread().name)
+        return super().get_read_only_response(request)
+
+class ScoresASGIHandlerTests(TransactionTestCase):
+    def setUp(self):
+        self.harold = Player(name='Harold')
+        self.harold.save()
+        self.game = Game.objects.create_with_players(
+            'Movie Night', [self.harold.pk]
+        )
+        self.handler = RecordingASGIHandler()
+        self.handler.reader_threads = []
+
+    def request(self, method, path):
+        async def run():
+            communicator = ApplicationCommunicator(self.handler, {
+                'type': 'http',
+                'method': method,
+                'path': path,
+                'query_string': b'',
+                'headers': [(b'host', b'testserver')],
+            })
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(5)
+            body = await communicator.receive_output(5)
+            await communicator.wait(5)
+            return start['status'], body['body']
+        return asyncio.run(run())
+
+    def test_read_only_pages_use_reader_threads(self):
+        for path in [
+            reverse('scores:index'),
+            reverse('scores:game', args=(self.game.pk,)),
+            reverse('scores:api_scoreboard', args=(self.game.pk,)),
+        ]:
+            status, body = self.request('GET', path)
+            self.assertEqual(status, 200)
+        self.assertIn(b'Movie Night', body)
+        self.assertEqual(len(self.handler.reader_threads), 3)
+        for name in self.handler.reader_threads:
+            self.assertTrue(name.startswith('scores-reader'))
+
+    def test_streaming_responses_are_read_off_the_event_loop(self):
+        User.objects.create_user('admin', password='pw', is_staff=True)
+        self.client.login(username='admin', password='pw')
+        cookie = self.client.cookies['sessionid'].value
+
+        async def run():
+            communicator = ApplicationCommunicator(self.handler, {
+                'type': 'http',
+                'method': 'GET',
+                'path': reverse('scores:api_export_games'),
+                'query_string': b'',
+                'headers': [
+                    (b'host', b'testserver'),
+                    (b'cookie', ('sessionid=%s' % cookie).encode()),
+                ],
+            })
+            await communicator.send_input({'type': 'http.request'})
+            messages = [await communicator.receive_output(5)]
+            messages.append(await communicator.receive_output(5))
+            while messages[-1].get('more_body'):
+                messages.append(await communicator.receive_output(5))
+            await communicator.wait(5)
+            return messages
+        messages = asyncio.run(run())
+        self.assertEqual(messages[0]['status'], 200)
+        body = b''.join(m.get('body', b'') for m in messages[1:])
+        self.assertIn(b'"Movie Night"', body)
+
+    def test_writes_use_the_shared_thread(self):
+        self.request('POST', reverse('scores:api_add_turn', args=(self.game.pk,)))
+        self.request('GET', reverse('scores:player_list'))
+        self.assertEqual(self.handler.reader_threads, [])
+
+    def test_only_scores_pages_use_the_readers(self):
+        self.assertEqual(route(reverse('scores:index'))[0], 'scores:index')
+        self.assertNotIn(route('/admin/')[0], READ_ONLY_VIEWS)
+        self.request('GET', '/admin/')
+        self.assertEqual(self.handler.reader_threads, [])
+
+    def test_bench_readers_reports_each_handler(self):
+        out = StringIO()
+        call_command(
+            'bench_readers', readers=2, requests=3, host='testserver',
+            latency=1, stdout=out
+        )
+        output = out.getvalue()
+        for name in ['wsgi', 'asgi (django)', 'asgi (scores)']:
+            self.assertIn(name, output)
+        self.assertEqual(output.count(' 0 failed'), 3)
+
+class ConcurrentTurnTests(TransactionTestCase):
+    workers = 8
+    requests_per_worker = 10
+
+    def setUp(self):
+        self.game = Game(name='Tablet Night')
+        self.game.save()
+        self.players = []
+        for name in ['Harold', 'Maude', 'Ruth']:
+            p = Player(name=name)
+            p.save()
+            self.game.add_player(p.pk)
+            self.players.append(p)
+        self.game.add_turn()
+
+    def hammer(self, worker):
+        latencies = []
+        try:
+            for i in range(self.requests_per_worker):
+                start = time.monotonic()
+                if i % 2:
+                    self.client_class().post(
+                        reverse('scores:next_turn', args=(self.game.pk,))
+                    )
+                else:
+                    self.client_class().post(
+                        reverse('scores:add_turn_score', args=(self.game.pk,)),
+                        data={
+                            'add_road_score': 'Completed Road',
+                            'player': str(self.players[worker % 3].pk),
+                            'tiles': '2',
+                        }
+                    )
+                latencies.append(time.monotonic() - start)
+        finally:
+            connection.close()
+        return latencies
+
+    def test_concurrent_next_turn_and_scores(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self.hammer, range(self.workers)))
+        turns = self.game.turn_set.count()
+        expected_turns = 1 + self.workers * self.requests_per_worker // 2
+        self.assertEqual(turns, expected_turns)
+        numbers = sorted(self.game.turn_set.values_list('number', flat=True))
+        self.assertEqual(numbers, list(range(expected_turns)))
+        self.assertEqual(self.game.turn_number(), expected_turns - 1)
+        expected_points = 2 * self.workers * self.requests_per_worker // 2
+        total = sum(s for p, s in self.game.total_scores())
+        self.assertEqual(total, expected_points)
+        worst = max(max(latencies) for latencies in results)
+        self.assertLess(worst, 5)
+
+    def test_concurrent_add_player(self):
+        game = Game(name='Crowded Night')
+        game.save()
+        players = []
+        for i in range(self.workers):
+            p = Player(name='Guest %d' % i)
+            p.save()
+            players.append(p)
+
+        def sit(player):
+            try:
+                Game.objects.get(pk=game.pk).add_player(player.pk)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(sit, players))
+        orders = sorted(game.gameplayer_set.values_list('order', flat=True))
+        self.assertEqual(orders, list(range(1, self.workers + 1)))
+        self.assertEqual(len(game.replay()['players']), self.workers)
+
+    def test_loadtest_plays_games_and_reports_each_view(self):
+        out = StringIO()
+        call_command(
+            'loadtest', players=6, history=3, games=3, workers=2, tiles=6,
+            host='testserver', stdout=out
+        )
+        output = out.getvalue()
+        self.assertIn('Seeded 3 game(s)', output)
+        for name in ['create_game', 'next_turn', 'end_game', 'scores:game']:
+            self.assertIn(name, output)
+        self.assertEqual(Game.objects.filter(name='loadtest').count(), 3)
+        self.assertFalse(Game.objects.filter(
+            name='loadtest', ended=False
+        ).exists())
+        self.assertEqual(
+            Turn.objects.filter(game__name='loadtest').count(), 3 * 5
+        )
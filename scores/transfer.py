@@ -0,0 +1,424 @@
+"""
+Moving whole games in and out as NDJSON or CSV.
+
+An NDJSON line holds one game:
+
+    {"key": "1", "name": "Movie Night", "created": "2019-05-04T20:00:00+00:00",
+     "ended": true, "players": ["Harold", "Maude"], "turns": 2,
+     "scores": [{"turn": 0, "player": "Maude", "event": "road", "points": 3},
+                {"turn": null, "player": "Harold", "event": "field",
+                 "points": 6}]}
+
+A CSV row holds one score, repeating its game's columns (CSV_FIELDS);
+consecutive rows with the same game key are one game. The turn is blank
+for final scores, and a game without scores has one row with the score
+columns blank. Players are listed in seat order as a JSON list, so any
+name survives; a plain list separated by PLAYER_SEPARATOR is read too.
+Players are matched to existing players by name.
+
+Exports use the same formats, keyed by game id, so they can be imported
+again.
+"""
+import csv
+import json
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Counter, Game, GamePlayer, GameSnapshot, Player, PlayerStats, Score,
+    Turn
+)
+
+CSV_FIELDS = (
+    'game', 'name', 'created', 'ended', 'players', 'turns',
+    'turn', 'player', 'event', 'points',
+)
+PLAYER_SEPARATOR = ';'
+TURN_EVENTS = ('road', 'city', 'monastery')
+FINAL_EVENTS = ('road', 'city', 'monastery', 'field')
+# import_games' default limit, far more than the base game's 72 tiles and
+# every expansion together, but few enough to build the turns in memory
+MAX_TURNS = 10000
+
+
+class TransferError(ValueError):
+    pass
+
+def read_ndjson(lines):
+    """
+    Yield (line number, game) for each non-blank line
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            game = json.loads(line)
+        except ValueError as e:
+            raise TransferError('line %d: %s' % (number, e))
+        yield number, game
+
+def read_csv(lines):
+    """
+    Yield (row number, game) for each run of rows sharing a game key
+    """
+    rows = csv.DictReader(lines)
+    missing = set(CSV_FIELDS) - set(rows.fieldnames or ())
+    if missing:
+        raise TransferError('missing columns: %s' % ', '.join(sorted(missing)))
+    game = None
+    number = 1
+    for number, row in enumerate(rows, 2):
+        if game is None or row['game'] != game['key']:
+            if game is not None:
+                yield number - 1, game
+            game = {
+                'key': row['game'],
+                'name': row['name'],
+                'created': row['created'] or None,
+                'ended': row['ended'].lower() in ('1', 'true', 'yes'),
+                'players': read_players(number, row['players']),
+                'turns': row['turns'],
+                'scores': [],
+            }
+        if row['player']:
+            game['scores'].append({
+                'turn': row['turn'] if row['turn'] != '' else None,
+                'player': row['player'],
+                'event': row['event'],
+                'points': row['points'],
+            })
+    if game is not None:
+        yield number, game
+
+def read_players(number, value):
+    """
+    The seat order from a CSV players column
+    """
+    if not value.startswith('['):
+        return [ name for name in value.split(PLAYER_SEPARATOR) if name ]
+    try:
+        return json.loads(value)
+    except ValueError as e:
+        raise TransferError('line %d: players: %s' % (number, e))
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+def clean_game(number, game, max_turns=None):
+    """
+    Check a game read from a file and convert its values, raising
+    TransferError with the line number if anything is wrong, including
+    more than max_turns turns (if given)
+    """
+    def fail(message):
+        raise TransferError('line %d: %s' % (number, message))
+    if not isinstance(game, dict):
+        fail('expected a game object')
+    players = game.get('players')
+    if not game.get('name') or not isinstance(players, list) or not players:
+        fail('a game needs a name and a list of players')
+    if not all(isinstance(name, str) and name for name in players):
+        fail('players are listed by name')
+    if len(set(players)) != len(players):
+        fail('a player can only take one seat')
+    created = game.get('created')
+    if created:
+        try:
+            created = datetime.fromisoformat(created)
+        except (TypeError, ValueError):
+            fail('created must be an ISO 8601 date and time')
+        if timezone.is_naive(created):
+            created = timezone.make_aware(created)
+    else:
+        created = timezone.now()
+    if not isinstance(game.get('scores') or [], list):
+        fail('scores must be a list')
+    scores = []
+    for score in game.get('scores') or []:
+        if not isinstance(score, dict):
+            fail('expected a score object')
+        try:
+            turn = None if score.get('turn') is None else int(score['turn'])
+            points = int(score.get('points'))
+        except (TypeError, ValueError):
+            fail('turns and points must be whole numbers')
+        events = FINAL_EVENTS if turn is None else TURN_EVENTS
+        if score.get('event') not in events:
+            fail('%r cannot score %s' % (
+                score.get('event'),
+                'at the end' if turn is None else 'during the game'
+            ))
+        if score.get('player') not in players:
+            fail('%r is not seated in this game' % (score.get('player'),))
+        if turn is not None and turn < 0:
+            fail('turn numbers start at 0')
+        scores.append({
+            'turn': turn,
+            'player': score['player'],
+            'event': score['event'],
+            'points': points,
+        })
+    try:
+        turns = int(game.get('turns') or 0)
+    except (TypeError, ValueError):
+        fail('turns must be a whole number')
+    # every game has at least the first turn, and a turn for each score
+    turns = max([turns, 1] + [
+        s['turn'] + 1 for s in scores if s['turn'] is not None
+    ])
+    if max_turns is not None and turns > max_turns:
+        fail('a game can have at most %d turns' % max_turns)
+    return {
+        'name': game['name'],
+        'created': created,
+        'ended': bool(game.get('ended')),
+        'players': players,
+        'turns': turns,
+        'scores': scores,
+    }
+
+class GameImporter:
+    """
+    Write cleaned games in chunks, each in its own transaction with a
+    fixed number of bulk statements. Player names are looked up in a
+    dictionary loaded once, and new players are created as they appear.
+    """
+    def __init__(self, chunk_size=200):
+        self.chunk_size = chunk_size
+        self.player_ids = {}
+        players = Player.objects.order_by('-pk').values_list('pk', 'name')
+        for pk, name in players.iterator():
+            # the oldest player with a name wins
+            self.player_ids[name] = pk
+        self.games = 0
+        self.scores = 0
+        self.finished_player_ids = set()
+
+    def run(self, games):
+        """
+        Import an iterable of cleaned games, then refresh the players'
+        career stats once, even if a bad game stops the import part way
+        """
+        chunk = []
+        try:
+            for game in games:
+                chunk.append(game)
+                if len(chunk) >= self.chunk_size:
+                    self.write_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self.write_chunk(chunk)
+        finally:
+            ids = sorted(self.finished_player_ids)
+            for i in range(0, len(ids), 500):
+                PlayerStats.objects.refresh(ids[i:i + 500])
+
+    def write_chunk(self, chunk):
+        with transaction.atomic():
+            self.create_players(chunk)
+            games = self.create_games(chunk)
+            seats, turns, snapshots = [], [], []
+            for data, game in zip(chunk, games):
+                standings = self.standings(data)
+                for order, name in enumerate(data['players']):
+                    seats.append(GamePlayer(
+                        game_id=game.pk,
+                        player_id=self.player_ids[name],
+                        order=order,
+                        **standings[name]
+                    ))
+                for number in range(data['turns']):
+                    turns.append(Turn(
+                        game_id=game.pk,
+                        number=number,
+                        player_id=self.player_ids[
+                            data['players'][number % len(data['players'])]
+                        ],
+                    ))
+                snapshots.append(GameSnapshot(
+                    game_id=game.pk,
+                    last_event_id=0,
+                    state=json.dumps(self.state(data, standings)),
+                ))
+            GamePlayer.objects.bulk_create(seats)
+            Turn.objects.bulk_create(turns)
+            GameSnapshot.objects.bulk_create(snapshots)
+            # a range rather than a list of ids keeps the query small
+            game_ids = [ game.pk for game in games ]
+            turn_ids = {
+                (game_id, number): pk for pk, game_id, number in
+                Turn.objects.filter(
+                    game_id__gte=min(game_ids), game_id__lte=max(game_ids)
+                ).values_list('pk', 'game_id', 'number')
+            }
+            scores = [
+                Score(
+                    game_id=game.pk,
+                    turn_id=(
+                        None if s['turn'] is None
+                        else turn_ids[(game.pk, s['turn'])]
+                    ),
+                    is_final=s['turn'] is None,
+                    player_id=self.player_ids[s['player']],
+                    event=s['event'],
+                    points=s['points'],
+                )
+                for data, game in zip(chunk, games)
+                for s in data['scores']
+            ]
+            Score.objects.bulk_create(scores)
+            if any(data['ended'] for data in chunk):
+                Counter.objects.bump(Counter.LEADERBOARD)
+        self.games += len(chunk)
+        self.scores += len(scores)
+        for data in chunk:
+            if data['ended']:
+                self.finished_player_ids.update(
+                    self.player_ids[name] for name in data['players']
+                )
+
+    def create_players(self, chunk):
+        new = sorted(set(
+            name for data in chunk for name in data['players']
+            if name not in self.player_ids
+        ))
+        if not new:
+            return
+        Player.objects.bulk_create([
+            Player(name=name, search_name=name.casefold()) for name in new
+        ])
+        for pk, name in Player.objects.filter(name__in=new).order_by(
+            '-pk'
+        ).values_list('pk', 'name'):
+            self.player_ids[name] = pk
+
+    def create_games(self, chunk):
+        games = [
+            Game(
+                name=data['name'],
+                created=data['created'],
+                ended=data['ended'],
+                last_turn_number=data['turns'] - 1,
+                version=1,
+            )
+            for data in chunk
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            return Game.objects.bulk_create(games)
+        # this backend can't report the keys of bulk inserted rows
+        for game in games:
+            game.save()
+        return games
+
+    def standings(self, data):
+        standings = {
+            name: dict.fromkeys(GamePlayer.STANDING_FIELDS, 0)
+            for name in data['players']
+        }
+        for s in data['scores']:
+            standing = standings[s['player']]
+            phase_field = 'final_points' if s['turn'] is None else 'turn_points'
+            standing[phase_field] += s['points']
+            standing['%s_points' % s['event']] += s['points']
+        return standings
+
+    def state(self, data, standings):
+        # what replaying the game's log would give, as the log starts here
+        return {
+            'players': [ self.player_ids[name] for name in data['players'] ],
+            'turn_number': data['turns'] - 1,
+            'ended': data['ended'],
+            'standings': {
+                str(self.player_ids[name]): standing
+                for name, standing in standings.items()
+            },
+        }
+
+def export_games(games=None, chunk_size=200):
+    """
+    Yield each game (all of them, or those in the games queryset) in the
+    interchange format, oldest first. Games are read a chunk at a time by
+    primary key with a few queries per chunk, so memory use doesn't grow
+    with the history and no query stays open between chunks.
+    """
+    if games is None:
+        games = Game.objects.all()
+    highest = Turn.objects.filter(game_id=OuterRef('pk')).order_by(
+        '-number'
+    ).values('number')[:1]
+    games = games.annotate(
+        highest_turn=Coalesce('last_turn_number', Subquery(highest))
+    ).order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(games.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        last_pk = chunk[-1].pk
+        in_chunk = {'game_id__in': [ game.pk for game in chunk ]}
+        players = {}
+        for game_id, name in GamePlayer.objects.filter(**in_chunk).order_by(
+            'game_id', 'order'
+        ).values_list('game_id', 'player__name'):
+            players.setdefault(game_id, []).append(name)
+        scores = {}
+        for game_id, turn, name, event, points in Score.objects.filter(
+            **in_chunk
+        ).order_by('game_id', 'pk').values_list(
+            'game_id', 'turn__number', 'player__name', 'event', 'points'
+        ):
+            scores.setdefault(game_id, []).append({
+                'turn': turn,
+                'player': name,
+                'event': event,
+                'points': points,
+            })
+        for game in chunk:
+            yield {
+                'key': str(game.pk),
+                'name': game.name,
+                'created': game.created.isoformat(),
+                'ended': game.ended,
+                'players': players.get(game.pk, []),
+                'turns': (
+                    0 if game.highest_turn is None else game.highest_turn + 1
+                ),
+                'scores': scores.get(game.pk, []),
+            }
+        if len(chunk) < chunk_size:
+            return
+
+def write_ndjson(games):
+    for game in games:
+        yield json.dumps(game) + '\n'
+
+class Echo:
+    """
+    A file-like object whose write returns what it was given, so a csv
+    writer can produce one line at a time
+    """
+    def write(self, value):
+        return value
+
+def write_csv(games):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for game in games:
+        columns = [
+            game['key'], game['name'], game['created'],
+            'true' if game['ended'] else 'false',
+            json.dumps(game['players']), game['turns'],
+        ]
+        if not game['scores']:
+            yield writer.writerow(columns + ['', '', '', ''])
+        for score in game['scores']:
+            yield writer.writerow(columns + [
+                '' if score['turn'] is None else score['turn'],
+                score['player'], score['event'], score['points'],
+            ])
+
+WRITERS = {'csv': write_csv, 'ndjson': write_ndjson}
+CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
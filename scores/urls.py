@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, live, views
 
 app_name='scores'
 
@@ -9,10 +9,13 @@ urlpatterns = [
     path('game/<int:pk>/', views.GameView.as_view(), name='game'),
     path('player/', views.PlayerListView.as_view(), name='player_list'),
     path('player/<int:pk>/', views.PlayerView.as_view(), name='player'),
+    path('player/search', api.search_players, name='player_search'),
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
     path('start_game', views.NewGameView.as_view(), name='start_game'),
     path('create_game', views.create_game, name='create_game'),
     path('game/<int:game_id>/next_turn', views.next_turn, name='next_turn'),
     path('game/<int:game_id>/end', views.end_game, name='end_game'),
+    path('game/<int:game_id>/undo', views.undo_score, name='undo_score'),
     path(
         'game/<int:game_id>/add_turn_score',
         views.add_turn_score,
@@ -23,4 +26,41 @@ urlpatterns = [
         views.add_final_score,
         name='add_final_score'
     ),
+    path('api/csrf', api.csrf, name='api_csrf'),
+    path('api/games', api.create_game, name='api_create_game'),
+    path('api/games/<int:game_id>', api.scoreboard, name='api_scoreboard'),
+    path('api/games/<int:game_id>/turns', api.add_turn, name='api_add_turn'),
+    path(
+        'api/games/<int:game_id>/timeline', api.timeline, name='api_timeline'
+    ),
+    path(
+        'api/games/<int:game_id>/turn_scores',
+        api.add_turn_score,
+        name='api_add_turn_score'
+    ),
+    path(
+        'api/games/<int:game_id>/final_scores',
+        api.add_final_score,
+        name='api_add_final_score'
+    ),
+    path(
+        'api/games/<int:game_id>/scores',
+        api.add_scores,
+        name='api_add_scores'
+    ),
+    path(
+        'api/games/<int:game_id>/scores/<int:score_id>',
+        api.edit_score,
+        name='api_edit_score'
+    ),
+    path(
+        'api/games/<int:game_id>/events',
+        live.game_events,
+        name='api_game_events'
+    ),
+    path('api/games/<int:game_id>/undo', api.undo_score, name='api_undo_score'),
+    path('api/games/<int:game_id>/end', api.end_game, name='api_end_game'),
+    path('api/cache_stats', api.cache_stats, name='api_cache_stats'),
+    path('api/metrics', api.view_metrics, name='api_metrics'),
+    path('api/export', api.export_games, name='api_export_games'),
 ]
@@ -1,54 +1,144 @@
+from datetime import date, datetime
+
+from django.db.models import Q
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views import generic
+from django.views.decorators.http import require_POST
 from django.urls import reverse, reverse_lazy
 from django import forms
 from django.forms import ModelChoiceField
 
-from .models import Game, Player, GamePlayer
+from . import leaderboard
+from .models import Game, Player, PlayerStats
 
 class IndexView(generic.ListView):
     template_name = 'scores/index.html'
+    context_object_name = 'game_list'
+    page_size = 20
+    statuses = {'ended': True, 'in_progress': False}
 
     def get_queryset(self):
         """
-        Return all games
+        Return one page of games, newest first, starting after the cursor
         """
-        return Game.objects.all()
+        games = Game.objects.with_summary().order_by('-created', '-id')
+        status = self.request.GET.get('status')
+        if status in self.statuses:
+            games = games.filter(ended=self.statuses[status])
+        cursor = parse_cursor(self.request.GET.get('before', ''))
+        if cursor is not None:
+            created, pk = cursor
+            games = games.filter(
+                Q(created__lt=created) | Q(created=created, id__lt=pk)
+            )
+        return games[:self.page_size + 1]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        games = list(context['game_list'])
+        next_cursor = None
+        if len(games) > self.page_size:
+            games = games[:self.page_size]
+            next_cursor = make_cursor(games[-1])
+        context['game_list'] = games
+        context['next_cursor'] = next_cursor
+        context['status'] = self.request.GET.get('status', '')
+        return context
+
+def make_cursor(game):
+    return '%s_%d' % (game.created.isoformat(), game.pk)
+
+def parse_cursor(cursor):
+    """
+    Return the (created, id) pair encoded by make_cursor, or None
+    """
+    created, _, pk = cursor.rpartition('_')
+    try:
+        return datetime.fromisoformat(created), int(pk)
+    except ValueError:
+        return None
 
 
+def conditional_response(request, game, render):
+    """
+    Answer 304 Not Modified if the client already has this version of the
+    game, otherwise return render(). Either way clients are told to check
+    back with the ETag before reusing their copy.
+    """
+    etag = game.etag()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render()
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
 class GameView(generic.DetailView):
     model = Game
     template_name = 'scores/game.html'
 
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        return conditional_response(
+            request,
+            self.object,
+            lambda: self.render_to_response(
+                self.get_context_data(object=self.object)
+            )
+        )
+
+class PlayerSearchInput(forms.TextInput):
+    """
+    A hidden player id plus a name box that looks players up as you type,
+    so the page doesn't have to list every registered player
+    """
+    template_name = 'scores/widgets/player_search.html'
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        player = None
+        try:
+            player = Player.objects.filter(pk=int(value)).first()
+        except (TypeError, ValueError):
+            # nothing chosen, or a value that can't be a player id
+            pass
+        context['widget']['player_name'] = player.name if player else ''
+        context['widget']['search_url'] = reverse('scores:player_search')
+        return context
+
 class StartGameForm(forms.Form):
     name = forms.CharField()
     players = Player.objects.all()
-    player0 = ModelChoiceField(label = "First Player", queryset=players)
-    player1 = ModelChoiceField(label = "Second Player", queryset=players)
+    player0 = ModelChoiceField(label = "First Player", queryset=players,
+            widget=PlayerSearchInput)
+    player1 = ModelChoiceField(label = "Second Player", queryset=players,
+            widget=PlayerSearchInput)
     player2 = ModelChoiceField(label = "Third Player", queryset=players,
-            required=False)
+            widget=PlayerSearchInput, required=False)
     player3 = ModelChoiceField(label = "Fourth Player", queryset=players,
-            required=False)
+            widget=PlayerSearchInput, required=False)
     player4 = ModelChoiceField(label = "Fifth Player", queryset=players,
-            required=False)
+            widget=PlayerSearchInput, required=False)
     #TODO: prevent duplicate players
     #TODO: force game name to be unique
 
 def create_game(request):
     name = request.POST['name']
-    game = Game(name=name)
-    game.save()
+    player_ids = []
     for i in range(5):
-        k = "player%d" % i
-        v = request.POST[k]
+        v = request.POST.get("player%d" % i, '')
         if v != '':
-            player_id = int(v)
-            gp = GamePlayer(player_id=player_id, game_id=game.pk, order=i)
-            gp.save()
-            #TODO: handle invalid player id
-    game.add_turn()
-    return HttpResponseRedirect(reverse('scores:game', args={game.pk}))
+            player_ids.append(v)
+    try:
+        game = Game.objects.create_with_players(name, player_ids)
+    except ValueError as e:
+        return render(request, 'scores/start_game.html', {
+            'form': StartGameForm(request.POST),
+            'error': str(e),
+        }, status=400)
+    return HttpResponseRedirect(reverse('scores:game', args=(game.pk,)))
 
 def next_turn(request, game_id):
     game = Game.objects.get(pk=game_id)
@@ -103,8 +193,13 @@ def add_final_score(request, game_id):
 
 def end_game(request, game_id):
     game = Game.objects.get(pk=game_id)
-    game.ended = True
-    game.save()
+    game.end_game()
+    return HttpResponseRedirect(reverse('scores:game', args=(game.pk,)))
+
+@require_POST
+def undo_score(request, game_id):
+    game = Game.objects.get(pk=game_id)
+    game.undo_last_score()
     return HttpResponseRedirect(reverse('scores:game', args=(game.pk,)))
 
 class NewGameView(generic.FormView):
@@ -114,13 +209,51 @@ class NewGameView(generic.FormView):
 
 class PlayerListView(generic.ListView):
     template_name = 'scores/player_list.html'
+    paginate_by = 50
 
     def get_queryset(self):
         """
-        Return all players
+        Return players whose names start with the search text, if any
         """
-        return Player.objects.all()
+        return Player.objects.name_prefix(self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['q'] = self.request.GET.get('q', '')
+        return context
 
 class PlayerView(generic.DetailView):
     model = Player
     template_name = 'scores/player.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['stats'] = PlayerStats.objects.filter(
+            player=self.object
+        ).first() or PlayerStats(player=self.object)
+        return context
+
+class LeaderboardView(generic.TemplateView):
+    template_name = 'scores/leaderboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        since = parse_date(self.request.GET.get('since', ''))
+        until = parse_date(self.request.GET.get('until', ''))
+        order = self.request.GET.get('order', 'wins')
+        if order not in leaderboard.ORDERS:
+            order = 'wins'
+        context['rankings'] = leaderboard.rankings(since, until, order)
+        context['since'] = since
+        context['until'] = until
+        context['order'] = order
+        return context
+
+def parse_date(text):
+    """
+    Return the date in a YYYY-MM-DD string, or None
+    """
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return None